@@ -0,0 +1,219 @@
+"""Antrian tulis persisten: upload dijalankan worker latar, bukan di thread script Streamlit.
+
+Job beserta salinan file upload disimpan di disk (SQLite + folder per job), sehingga refresh
+browser atau restart proses tidak menghilangkan upload; job yang terputus di tengah proses
+diulang saat antrian dibuka lagi (ingest idempoten, lihat core.siapkan_ingest). File job hanya
+dihapus setelah job selesai; job gagal menyimpan filenya sampai diulang (AntrianTulis.ulangi).
+Worker mengambil semua job yang menunggu sekaligus dan menggabungkannya menjadi satu ingest:
+satu tulis ke storage/mirror dan satu batch log, walau dikirim beberapa admin bersamaan.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from core import siapkan_ingest, simpan_ingest
+from metrik import span
+from storage import MirrorGagal
+
+MENUNGGU = "menunggu"
+PROSES = "proses"
+SELESAI = "selesai"
+GAGAL = "gagal"
+
+JEDA_GABUNG = 1.0   # detik menunggu kiriman lain sebelum satu batch diproses
+INTERVAL = 5        # detik antar pengecekan antrian bila tidak ada sinyal
+
+SKEMA = """
+CREATE TABLE IF NOT EXISTS job (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, dibuat TEXT, pengirim TEXT, status TEXT NOT NULL,
+    files TEXT, progres TEXT, hasil TEXT, galat TEXT, selesai TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_job_status ON job (status);
+"""
+
+
+def _sekarang():
+    return (datetime.utcnow() + timedelta(hours=7)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class AntrianTulis:
+    """Antrian job ingest di `folder`; satu instance (dan satu worker) per proses."""
+
+    def __init__(self, storage, folder, pdf_cache=None, setelah_tulis=None, master=None):
+        self.storage = storage
+        self.folder = folder
+        self.pdf_cache = pdf_cache
+        self.master = master  # MasterPegawai bersama; None = dimuat dari storage tiap batch
+        self.setelah_tulis = setelah_tulis  # dipanggil tiap batch selesai ditulis (mis. SnapshotStore.segarkan)
+        self.path = os.path.join(folder, "antrian.sqlite")
+        self._sinyal = threading.Event()
+        os.makedirs(folder, exist_ok=True)
+        with self._db() as db:
+            db.executescript(SKEMA)
+            # Terputus saat diproses (proses mati/restart): ulangi
+            db.execute("UPDATE job SET status = ?, progres = NULL WHERE status = ?", (MENUNGGU, PROSES))
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield db
+            db.commit()
+        finally:
+            db.close()
+
+    def kirim(self, files, pengirim):
+        """Simpan `files` [(nama, bytes)] ke disk sebagai job baru. Return id job."""
+        with self._db() as db:
+            job_id = db.execute("INSERT INTO job (dibuat, pengirim, status) VALUES (?, ?, ?)",
+                                (_sekarang(), pengirim, MENUNGGU)).lastrowid
+            folder_job = os.path.join(self.folder, f"job_{job_id}")
+            os.makedirs(folder_job, exist_ok=True)
+            daftar = []
+            for i, (nama, isi) in enumerate(files):
+                path = os.path.join(folder_job, f"{i}_{os.path.basename(nama)}")
+                with open(path, 'wb') as f:
+                    f.write(isi)
+                daftar.append([nama, path])
+            db.execute("UPDATE job SET files = ? WHERE id = ?", (json.dumps(daftar), job_id))
+        self._sinyal.set()
+        return job_id
+
+    def status(self, job_id):
+        with self._db() as db:
+            row = db.execute("SELECT id, dibuat, pengirim, status, progres, hasil, galat, selesai FROM job WHERE id = ?",
+                             (job_id,)).fetchone()
+        return None if row is None else self._baris(row)
+
+    def terbaru(self, pengirim=None, n=5):
+        """Job terakhir (opsional milik `pengirim`), terbaru dulu."""
+        sql = "SELECT id, dibuat, pengirim, status, progres, hasil, galat, selesai FROM job "
+        params = ()
+        if pengirim is not None:
+            sql += "WHERE pengirim = ? "
+            params = (pengirim,)
+        with self._db() as db:
+            rows = db.execute(sql + "ORDER BY id DESC LIMIT ?", params + (n,)).fetchall()
+        return [self._baris(r) for r in rows]
+
+    def ulangi(self, job_id):
+        """Antrekan ulang job gagal memakai file yang masih tersimpan. Return True bila diantrekan.
+
+        File yang sudah berhasil masuk pada percobaan sebelumnya terlewati sebagai duplikat.
+        """
+        if not os.path.isdir(os.path.join(self.folder, f"job_{job_id}")):
+            return False
+        with self._db() as db:
+            n = db.execute("UPDATE job SET status = ?, progres = NULL, hasil = NULL, galat = NULL, selesai = NULL "
+                           "WHERE id = ? AND status = ?", (MENUNGGU, job_id, GAGAL)).rowcount
+        if n:
+            self._sinyal.set()
+        return bool(n)
+
+    @staticmethod
+    def _baris(row):
+        kolom = ['id', 'dibuat', 'pengirim', 'status', 'progres', 'hasil', 'galat', 'selesai']
+        job = dict(zip(kolom, row))
+        job['hasil'] = json.loads(job['hasil']) if job['hasil'] else None
+        return job
+
+    # --- worker ---
+    def start(self):
+        def _loop():
+            while True:
+                self._sinyal.wait(INTERVAL)
+                self._sinyal.clear()
+                time.sleep(JEDA_GABUNG)
+                try:
+                    self.proses_menunggu()
+                except Exception:
+                    pass  # job sudah ditandai gagal; worker tetap hidup untuk kiriman berikutnya
+        threading.Thread(target=_loop, daemon=True).start()
+        self._sinyal.set()  # proses sisa job dari sesi sebelumnya
+        return self
+
+    def _ambil_menunggu(self):
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            rows = db.execute("SELECT id, pengirim, files FROM job WHERE status = ? ORDER BY id", (MENUNGGU,)).fetchall()
+            db.executemany("UPDATE job SET status = ? WHERE id = ?", [(PROSES, r[0]) for r in rows])
+        return [(job_id, pengirim, json.loads(files or "[]")) for job_id, pengirim, files in rows]
+
+    def _tandai(self, db, job_id, status, hasil=None, galat=None):
+        db.execute("UPDATE job SET status = ?, hasil = ?, galat = ?, selesai = ?, progres = NULL WHERE id = ?",
+                   (status, None if hasil is None else json.dumps(hasil), galat, _sekarang(), job_id))
+
+    def proses_menunggu(self):
+        """Proses semua job yang menunggu sebagai satu batch. Return jumlah job."""
+        jobs = self._ambil_menunggu()
+        if not jobs:
+            return 0
+        asal = {path: (job_id, nama) for job_id, _, files in jobs for nama, path in files}
+        total = len(asal)
+        dibaca = []
+
+        def progres(path, hasil):
+            dibaca.append(path)
+            with self._db() as db:
+                db.executemany("UPDATE job SET progres = ? WHERE id = ?",
+                               [(f"Membaca {len(dibaca)}/{total} file", job_id) for job_id, _, _ in jobs])
+
+        with span("antrian.batch", baris=len(jobs)):
+            selesai = self._jalankan(jobs, asal, progres)
+        # Job gagal (seluruh batch, atau ada file yang gagal dibaca) menyimpan filenya untuk ulangi()
+        for job_id in selesai:
+            shutil.rmtree(os.path.join(self.folder, f"job_{job_id}"), ignore_errors=True)
+        return len(jobs)
+
+    def _jalankan(self, jobs, asal, progres):
+        """Ingest satu batch dan tandai status tiap job. Return id job yang selesai."""
+        try:
+            pegawai = None if self.master is None else self.master.get()
+            ingest = siapkan_ingest(self.storage, [(path, path) for path in asal], progres=progres, pegawai=pegawai)
+            peringatan = None
+            try:
+                simpan_ingest(self.storage, ingest, self.pdf_cache)
+            except MirrorGagal as e:
+                peringatan = f"Data tersimpan lokal, tetapi sinkron ke cloud gagal: {e}"
+        except Exception as e:
+            with self._db() as db:
+                for job_id, _, _ in jobs:
+                    self._tandai(db, job_id, GAGAL, galat=str(e))
+            raise
+
+        # tap_baru & ditolak dihitung per batch (tap semua file digabung sebelum pairing)
+        hasil = {job_id: {'per_file': [], 'duplikat': [], 'peringatan': peringatan, 'tap_baru': len(ingest['taps']),
+                          'ditolak': ingest['ditolak'], 'gabung': len(jobs)} for job_id, _, _ in jobs}
+        for path, res in ingest['per_file']:
+            job_id, nama = asal[path]
+            hasil[job_id]['per_file'].append([nama, str(res) if isinstance(res, Exception) else res])
+        for path in ingest['duplikat']:
+            job_id, nama = asal[path]
+            hasil[job_id]['duplikat'].append(nama)
+
+        pengirim = {job_id: p for job_id, p, _ in jobs}
+        logs = [{"Waktu": _sekarang(), "Aksi": "UPLOAD", "Detail": f"[{pengirim[asal[path][0]]}] {asal[path][1]}"}
+                for path, res in ingest['per_file'] if not isinstance(res, Exception)]
+        try:
+            if logs:
+                self.storage.add_logs(logs)
+        except Exception:
+            pass  # log tidak boleh menggagalkan upload yang sudah tersimpan
+
+        if self.setelah_tulis is not None:
+            self.setelah_tulis()
+        selesai = []
+        with self._db() as db:
+            for job_id, _, _ in jobs:
+                gagal = [nama for nama, res in hasil[job_id]['per_file'] if isinstance(res, str)]
+                if gagal:
+                    self._tandai(db, job_id, GAGAL, hasil[job_id], galat=f"{len(gagal)} file gagal dibaca: {', '.join(gagal)}")
+                else:
+                    self._tandai(db, job_id, SELESAI, hasil[job_id])
+                    selesai.append(job_id)
+        return selesai
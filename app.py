@@ -1,14 +1,26 @@
+import time as time_lib
+_T0 = time_lib.perf_counter()
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta
 import calendar
-from fpdf import FPDF
-import plotly.express as px
-from streamlit_gsheets import GSheetsConnection
+import atexit
+import os
 import version_info
-import time as time_lib
-# LIBRARY NAVIGASI MODERN
-from streamlit_option_menu import option_menu 
+import metrik
+from kredensial import KredensialStore, TerlaluBanyakPercobaan
+from storage import KOLOM_DATA, MirrorGagal, PdfCache, Snapshot, SnapshotStore, buat_storage, ke_teks, ke_tipe
+from core import kategori_status, rentang_bulan, ringkasan_dashboard
+from antrian import AntrianTulis
+from pegawai import MasterPegawai
+# Modul berat (plotly, fpdf/laporan, option_menu, gsheets) di-import di halaman yang memakainya
+
+@st.cache_resource
+def _catat_import_awal():
+    # Sekali per proses: waktu import saat cold start (rerun berikutnya memakai modul yang sudah dimuat)
+    metrik.catat("app.import_awal", time_lib.perf_counter() - _T0)
+
+_catat_import_awal()
 
 # --- IMPORT VERSI OTOMATIS ---
 try:
@@ -98,15 +110,54 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # --- KONEKSI DATABASE ---
-conn = st.connection("gsheets", type=GSheetsConnection)
+# "sqlite+gsheets": SQLite lokal + Google Sheets sebagai mirror; "sqlite": lokal saja
+MODE_STORAGE = os.environ.get("ABSENSI_STORAGE", "sqlite+gsheets")
+# Penyimpanan utama, bukan cache: di container harus berupa volume (lihat Dockerfile)
+DIR_LOKAL = os.environ.get("ABSENSI_DIR_LOKAL", ".data_lokal")
+
+# Logo dikirim bersama repo; bila file belum ada, URL asli dirender browser (server tidak pernah mengunduh)
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "logo_bp2mi.png")
+LOGO_URL = "https://upload.wikimedia.org/wikipedia/commons/thumb/b/b7/Logo_Kementerian_Pelindungan_Pekerja_Migran_Indonesia_-_BP2MI_v2_%282024%29.svg/960px-Logo_Kementerian_Pelindungan_Pekerja_Migran_Indonesia_-_BP2MI_v2_%282024%29.svg.png"
+
+@st.cache_resource
+def get_storage():
+    conn = None
+    if MODE_STORAGE != "sqlite":
+        from streamlit_gsheets import GSheetsConnection
+        conn = st.connection("gsheets", type=GSheetsConnection)
+    storage = buat_storage(MODE_STORAGE, DIR_LOKAL, conn)
+    storage.start_background()
+    atexit.register(storage.flush_logs)
+    return storage
+
+@st.cache_resource
+def get_pdf_cache():
+    return PdfCache(os.path.join(DIR_LOKAL, "cache_pdf"))
+
+@st.cache_resource
+def get_master_pegawai():
+    # Daftar pegawai sah dimuat sekali per versi Data_Pegawai, dipakai bersama semua sesi & worker upload
+    return MasterPegawai(get_storage())
+
+@st.cache_resource
+def get_snapshot_store():
+    # Satu snapshot data untuk semua sesi, bukan salinan per sesi
+    return SnapshotStore(get_storage(), get_master_pegawai())
+
+@st.cache_resource
+def get_antrian():
+    # Satu worker per proses: upload semua sesi masuk antrian yang sama dan digabung per batch
+    return AntrianTulis(get_storage(), os.path.join(DIR_LOKAL, "antrian"), get_pdf_cache(),
+                        setelah_tulis=get_snapshot_store().segarkan, master=get_master_pegawai()).start()
+
+def tampil_logo(width):
+    st.image(LOGO_PATH if os.path.exists(LOGO_PATH) else LOGO_URL, width=width)
 
 # --- LOGIN SYSTEM ---
-def get_users_db():
-    try:
-        df = conn.read(worksheet="Users", ttl=0)
-        return df
-    except Exception:
-        return pd.DataFrame()
+@st.cache_resource
+def get_kredensial():
+    # Dimuat sekali per proses lalu di-refresh di latar; login tidak mengambil sheet Users
+    return KredensialStore(get_storage()).start()
 
 def check_login():
     if 'logged_in' not in st.session_state:
@@ -118,7 +169,7 @@ def check_login():
         col1, col2, col3 = st.columns([1, 1, 1])
         with col2:
             st.markdown("<div style='text-align:center; margin-top:50px;'>", unsafe_allow_html=True)
-            st.image("https://upload.wikimedia.org/wikipedia/commons/thumb/b/b7/Logo_Kementerian_Pelindungan_Pekerja_Migran_Indonesia_-_BP2MI_v2_%282024%29.svg/960px-Logo_Kementerian_Pelindungan_Pekerja_Migran_Indonesia_-_BP2MI_v2_%282024%29.svg.png", width=100)
+            tampil_logo(100)
             st.markdown("### Login Sistem Informasi Absensi")
             st.markdown("BP3MI Jawa Tengah")
             
@@ -127,21 +178,25 @@ def check_login():
             
             if st.button("Masuk Sistem", use_container_width=True):
                 with st.spinner("Memverifikasi..."):
-                    users_df = get_users_db()
-                    if not users_df.empty:
-                        user_found = users_df[
-                            (users_df['Username'] == username_input) & 
-                            (users_df['Password'] == password_input)
-                        ]
-                        if not user_found.empty:
-                            st.session_state['logged_in'] = True
-                            st.session_state['user_role'] = user_found.iloc[0]['Role']
-                            st.session_state['user_name'] = user_found.iloc[0]['Nama_Lengkap']
-                            st.success(f"Selamat datang, {st.session_state['user_name']}")
-                            time_lib.sleep(1)
-                            st.rerun()
+                    kredensial = get_kredensial()
+                    try:
+                        ada_user = bool(kredensial.users())
+                    except Exception:
+                        ada_user = False
+                    if ada_user:
+                        try:
+                            user_found = kredensial.verifikasi(username_input, password_input)
+                        except TerlaluBanyakPercobaan as e:
+                            st.error(f"Terlalu banyak percobaan gagal. Coba lagi dalam {e.sisa} detik.")
                         else:
-                            st.error("Username atau Password salah!")
+                            if user_found:
+                                st.session_state['logged_in'] = True
+                                st.session_state['user_role'], st.session_state['user_name'] = user_found
+                                st.success(f"Selamat datang, {st.session_state['user_name']}")
+                                time_lib.sleep(1)
+                                st.rerun()
+                            else:
+                                st.error("Username atau Password salah!")
                     else:
                         st.error("Database user kosong.")
             
@@ -152,6 +207,7 @@ def check_login():
             </div>
             """, unsafe_allow_html=True)
             st.markdown("</div>", unsafe_allow_html=True)
+        metrik.catat("app.render_login", time_lib.perf_counter() - _T0)
         return False 
     return True 
 
@@ -163,279 +219,59 @@ USER_ROLE = st.session_state['user_role']
 USER_NAME = st.session_state['user_name']
 
 # --- CRUD DATA (Logika Tetap) ---
-def get_data():
-    try:
-        df = conn.read(worksheet="Data_Utama", ttl="0")
-        if not df.empty:
-            df['Tanggal'] = pd.to_datetime(df['Tanggal']).dt.date
-        return df
-    except:
-        return pd.DataFrame(columns=['Nama', 'Tanggal', 'Jam_Masuk', 'Jam_Pulang', 'Status_Data'])
+# Frame bertipe ditampilkan sebagai teks: jam 'HH:MM:SS', Tanggal tanpa jam
+KOLOM_TAMPIL = {"Tanggal": st.column_config.DateColumn("Tanggal", format="YYYY-MM-DD")}
 
-def save_data(new_df):
+def get_snapshot():
     try:
-        current_df = get_data()
-        if not current_df.empty:
-            current_df['Tanggal'] = pd.to_datetime(current_df['Tanggal']).dt.date
-        
-        updated_df = pd.concat([current_df, new_df], ignore_index=True)
-        updated_df = updated_df.drop_duplicates(subset=['Nama', 'Tanggal'])
-        updated_df['Tanggal'] = updated_df['Tanggal'].astype(str)
-        conn.update(worksheet="Data_Utama", data=updated_df)
-        st.cache_data.clear()
-        return True
-    except Exception as e:
-        st.error(f"Error: {e}")
-        return False
+        return get_snapshot_store().get()
+    except Exception:
+        return Snapshot.kosong()
 
 def clear_all_data():
     try:
-        empty_df = pd.DataFrame(columns=['Nama', 'Tanggal', 'Jam_Masuk', 'Jam_Pulang', 'Status_Data'])
-        conn.update(worksheet="Data_Utama", data=empty_df)
-        st.cache_data.clear()
+        get_storage().clear_data()
+        get_pdf_cache().clear()
+        return True
+    except MirrorGagal as e:
+        get_pdf_cache().clear()
+        st.warning(f"Data lokal terhapus, tetapi cloud gagal dihapus: {e}")
         return True
     except Exception as e:
         st.error(f"Gagal menghapus: {e}")
         return False
 
 # --- LOGGING ---
-def get_logs():
-    try:
-        df_logs = conn.read(worksheet="Log_Sistem", ttl=0)
-        if df_logs.empty: return pd.DataFrame(columns=['Waktu', 'Aksi', 'Detail'])
-        return df_logs
-    except:
-        return pd.DataFrame(columns=['Waktu', 'Aksi', 'Detail'])
-
 def add_log(aksi, detail):
     now = (datetime.utcnow() + timedelta(hours=7)).strftime("%Y-%m-%d %H:%M:%S")
     detail_with_user = f"[{USER_NAME}] {detail}"
-    new_entry = pd.DataFrame([{"Waktu": now, "Aksi": aksi, "Detail": detail_with_user}])
     try:
-        current_logs = get_logs()
-        updated_logs = pd.concat([current_logs, new_entry], ignore_index=True) if not current_logs.empty else new_entry
-        conn.update(worksheet="Log_Sistem", data=updated_logs)
-        st.cache_data.clear()
+        get_storage().add_logs([{"Waktu": now, "Aksi": aksi, "Detail": detail_with_user}])
     except Exception as e:
         st.error(f"Gagal log: {e}")
 
-# --- PROSES FILE (ANTI-OVERLAP SHIFT LOGIC) ---
-def process_file(file):
-    try:
-        df = pd.read_csv(file, sep='\t', header=None, names=['ID','Timestamp','Mch','Cd','Nama','Status','X1','X2'])
-    except:
-        file.seek(0)
-        df = pd.read_csv(file, header=None, names=['ID','Timestamp','Mch','Cd','Nama','Status','X1','X2'])
-
-    df['Nama'] = df['Nama'].str.strip()
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-    df['Tanggal_Asli'] = df['Timestamp'].dt.date
-    df = df.sort_values(['Nama', 'Timestamp'])
-
-    final_data = []
-
-    for nama, group in df.groupby('Nama'):
-        dates = sorted(group['Tanggal_Asli'].unique())
-        used_timestamps = set()
-
-        for i, tgl in enumerate(dates):
-            logs_hari_ini = group[group['Tanggal_Asli'] == tgl]
-            timestamps = sorted(logs_hari_ini['Timestamp'].tolist())
-            timestamps = [t for t in timestamps if t not in used_timestamps]
-            
-            if not timestamps:
-                continue
-
-            log_pertama = timestamps[0]
-            log_terakhir = timestamps[-1] if len(timestamps) > 1 else None
-            
-            jam_masuk_fix = "-"
-            jam_pulang_fix = "-"
-            status_data = "Tidak Absen Pulang"
-            
-            waktu_log = log_pertama.time()
-            batas_malam = time(17, 30)
-
-            # SKENARIO 1: NORMAL
-            if log_pertama.hour < 13:
-                jam_masuk_fix = log_pertama.strftime('%H:%M:%S')
-                if log_terakhir:
-                    jam_pulang_fix = log_terakhir.strftime('%H:%M:%S')
-                    status_data = "Lengkap (Normal)"
-                    used_timestamps.add(log_terakhir) 
-                else:
-                    status_data = "Tidak Absen Pulang"
-            
-            # SKENARIO 2: ZONA AMBIGU
-            elif log_pertama.hour >= 13 and waktu_log < batas_malam:
-                if log_terakhir is None:
-                    jam_masuk_fix = "-"
-                    jam_pulang_fix = log_pertama.strftime('%H:%M:%S')
-                    status_data = "Tidak Absen Pagi"
-                    used_timestamps.add(log_pertama)
-                else:
-                    jam_masuk_fix = log_pertama.strftime('%H:%M:%S')
-                    jam_pulang_fix = log_terakhir.strftime('%H:%M:%S')
-                    status_data = "Lengkap (Normal)"
-                    used_timestamps.add(log_terakhir)
-
-            # SKENARIO 3: SHIFT MALAM
-            else: # waktu_log >= 18:15
-                jam_masuk_fix = log_pertama.strftime('%H:%M:%S')
-                found_out = False
-                if log_terakhir:
-                    durasi = (log_terakhir - log_pertama).total_seconds() / 3600
-                    if durasi > 3: 
-                        jam_pulang_fix = log_terakhir.strftime('%H:%M:%S')
-                        status_data = "Lengkap (Normal)"
-                        used_timestamps.add(log_terakhir)
-                        found_out = True
-                
-                if not found_out:
-                    tgl_besok = tgl + timedelta(days=1)
-                    if tgl_besok in dates:
-                        logs_besok = group[group['Tanggal_Asli'] == tgl_besok]
-                        if not logs_besok.empty:
-                            timestamps_besok = sorted(logs_besok['Timestamp'].tolist())
-                            potential_out = timestamps_besok[0]
-                            if potential_out.hour < 13:
-                                jam_pulang_fix = potential_out.strftime('%H:%M:%S')
-                                status_data = "Lengkap (Malam)"
-                                used_timestamps.add(potential_out)
-
-            final_data.append({
-                'Nama': nama,
-                'Tanggal': tgl,
-                'Jam_Masuk': jam_masuk_fix,
-                'Jam_Pulang': jam_pulang_fix,
-                'Status_Data': status_data
-            })
-
-    res = pd.DataFrame(final_data)
-    if not res.empty:
-        return res[['Nama', 'Tanggal', 'Jam_Masuk', 'Jam_Pulang', 'Status_Data']]
-    else:
-        return pd.DataFrame(columns=['Nama', 'Tanggal', 'Jam_Masuk', 'Jam_Pulang', 'Status_Data'])
-
-# --- FUNGSI PDF ---
-class PDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 10)
-        self.cell(0, 10, 'LAPORAN REKAPITULASI ABSENSI OUTSOURCING', 0, 1, 'C')
-        self.cell(0, 10, 'BP3MI JAWA TENGAH', 0, 1, 'C')
-
-def generate_pdf(df_source, year, month):
-    df_source = df_source.copy()
-    df_source['Nama'] = df_source['Nama'].fillna("Tanpa Nama")
-    df_source['Jam_Masuk'] = df_source['Jam_Masuk'].fillna("-").astype(str)
-    df_source['Jam_Pulang'] = df_source['Jam_Pulang'].fillna("-").astype(str)
-    df_source['Status_Data'] = df_source['Status_Data'].fillna("Tidak Lengkap").astype(str)
-
-    pdf = PDF(orientation='L', unit='mm', format='A4')
-    pdf.add_page()
-    num_days = calendar.monthrange(year, month)[1]
-    col_no, col_nama, col_summary = 8, 35, 15
-    w_remain = pdf.w - col_no - col_nama - (col_summary*3) - 20
-    col_day = w_remain / num_days
-    
-    nama_bulan = calendar.month_name[month].upper()
-    pdf.set_font("Arial", 'B', 9)
-    pdf.cell(0, 5, f"PERIODE : {nama_bulan} {year}", 0, 1, 'L')
-    pdf.ln(2)
-
-    pdf.set_font("Arial", 'B', 6)
-    pdf.cell(col_no, 12, 'No', 1, 0, 'C')
-    pdf.cell(col_nama, 12, 'Nama Pegawai', 1, 0, 'C')
-    for d in range(1, num_days+1):
-        wk = calendar.weekday(year, month, d)
-        pdf.set_fill_color(220,220,220) if wk >= 5 else pdf.set_fill_color(255,255,255)
-        pdf.cell(col_day, 12, str(d), 1, 0, 'C', fill=True)
-    pdf.cell(col_summary, 12, 'HADIR', 1, 0, 'C')
-    pdf.cell(col_summary, 12, 'ALPA', 1, 0, 'C')
-    pdf.cell(col_summary, 12, 'TIDAK LKP', 1, 1, 'C')
-
-    pegawai = sorted(df_source['Nama'].unique())
-    for idx, nama in enumerate(pegawai, 1):
-        h, a, tl = 0, 0, 0
-        pdf.set_font("Arial", '', 6)
-        pdf.cell(col_no, 10, str(idx), 1, 0, 'C')
-        pdf.cell(col_nama, 10, str(nama)[:18], 1, 0, 'L')
-        
-        for d in range(1, num_days+1):
-            curr_date = pd.Timestamp(year, month, d).date()
-            row = df_source[(df_source['Nama'] == nama) & (df_source['Tanggal'] == curr_date)]
-            fill, txt = False, ""
-            
-            if not row.empty:
-                m = row.iloc[0]['Jam_Masuk']
-                p = row.iloc[0]['Jam_Pulang']
-                stat = row.iloc[0]['Status_Data']
-                m = "-" if m in ["None","nan"] else m
-                p = "-" if p in ["None","nan"] else p
-                
-                if "Lengkap" in stat:
-                     if "Malam" in stat: pdf.set_fill_color(173, 216, 230) 
-                     else: pdf.set_fill_color(144, 238, 144) 
-                     txt = f"{m}\n{p}"; h += 1
-                else:
-                    pdf.set_fill_color(255, 255, 153); txt = f"{m if m!='-' else p}"; tl += 1
-                fill = True
-            else:
-                if calendar.weekday(year, month, d) < 5: 
-                    pdf.set_fill_color(255, 153, 153); txt = "X"; a += 1; fill = True
-                else: 
-                    pdf.set_fill_color(240,240,240); fill = True
-            
-            x, y = pdf.get_x(), pdf.get_y()
-            pdf.cell(col_day, 10, "", 1, 0, 'C', fill=fill)
-            pdf.set_xy(x, y+1); pdf.set_font("Arial",'',3); pdf.multi_cell(col_day, 3, txt, 0, 'C')
-            pdf.set_xy(x+col_day, y); pdf.set_font("Arial",'',6)
-        
-        pdf.cell(col_summary, 10, str(h), 1, 0, 'C')
-        pdf.cell(col_summary, 10, str(a), 1, 0, 'C')
-        pdf.cell(col_summary, 10, str(tl), 1, 1, 'C')
-
-    # LEGENDA
-    pdf.ln(8)
-    pdf.set_font("Arial", 'B', 7)
-    pdf.cell(0, 5, "KETERANGAN WARNA (LEGENDA):", 0, 1, 'L')
-    
-    def draw_legend(r, g, b, text):
-        pdf.set_fill_color(r, g, b)
-        pdf.cell(4, 4, "", 1, 0, 'C', fill=True)
-        pdf.cell(2)
-        pdf.cell(30, 4, text, 0, 0, 'L')
-        pdf.cell(5)
-
-    pdf.set_font("Arial", '', 7)
-    draw_legend(144, 238, 144, "Lengkap (Shift Normal)")
-    draw_legend(173, 216, 230, "Lengkap (Shift Malam)")
-    draw_legend(255, 255, 153, "Data Tidak Lengkap")
-    draw_legend(255, 153, 153, "Tidak Hadir (Alpa)")
-    draw_legend(240, 240, 240, "Hari Libur / Kosong")
-    
-    return pdf.output(dest='S').encode('latin-1')
-
 # --- SIDEBAR MENU MODERN & ELEGAN ---
 with st.sidebar:
-    st.image("https://upload.wikimedia.org/wikipedia/commons/thumb/b/b7/Logo_Kementerian_Pelindungan_Pekerja_Migran_Indonesia_-_BP2MI_v2_%282024%29.svg/960px-Logo_Kementerian_Pelindungan_Pekerja_Migran_Indonesia_-_BP2MI_v2_%282024%29.svg.png", width=60)
+    tampil_logo(60)
     st.markdown(f"**Halo, {USER_NAME}**")
     st.caption(f"Role: {USER_ROLE}")
     
     # Logout Button
     if st.button("🔒 Logout", use_container_width=True):
+        get_storage().flush_logs()
         st.session_state['logged_in'] = False
         st.rerun()
     
     st.write("---")
     
     # KONFIGURASI NAVIGASI MODERN
+    from streamlit_option_menu import option_menu
     menu_list = ["Dashboard", "Analisis Pegawai", "Manajemen Data", "Tentang Aplikasi"]
     icon_list = ["house", "bar-chart-line", "folder2-open", "info-circle"]
     
     if USER_ROLE == "Administrator":
-        menu_list.append("System Logs")
-        icon_list.append("journal-text")
+        menu_list += ["System Logs", "Performance"]
+        icon_list += ["journal-text", "speedometer2"]
 
     # OPTION MENU DENGAN WARNA HOVER YANG DIPERBAIKI (VISIBLE DARK/LIGHT)
     menu = option_menu(
@@ -461,25 +297,36 @@ with st.sidebar:
 
     st.write("---")
     if st.button("🔄 Refresh Data Cloud"):
-        st.cache_data.clear()
+        try:
+            get_storage().sync()
+        except MirrorGagal as e:
+            st.warning(f"Sinkron cloud gagal: {e}")
+        get_storage().invalidate()
         add_log("REFRESH", "Manual refresh") 
         st.rerun()
 
+    if getattr(get_storage(), 'galat_awal', None):
+        st.caption("⚠️ Data cloud belum tersinkron, tekan Refresh Data Cloud.")
+
     # --- VERSI DI BAWAH ---
     st.markdown(f"<div class='version-tag'>System Version: <b>{VERSION_TAG}</b><br>Updated: {LAST_UPDATED}</div>", unsafe_allow_html=True)
     st.caption("BP3MI Jateng © 2026")
 
 # --- KONTEN UTAMA ---
-df_global = get_data()
-
-try:
-    df_pegawai = conn.read(worksheet="Data_Pegawai", ttl=0)
-    PEGAWAI_SAH = df_pegawai['Nama'].dropna().tolist()
-except Exception:
-    PEGAWAI_SAH = []
+# Kartu & grafik membaca snapshot bersama (rekap bulanan pegawai sah, hanya-baca);
+# baris per hari diambil per rentang lewat query storage
+SNAPSHOT = get_snapshot()
+rekap_global = SNAPSHOT.rekap
 
-if len(PEGAWAI_SAH) > 0 and not df_global.empty:
-    df_global = df_global[df_global['Nama'].isin(PEGAWAI_SAH)]
+def query_attendance(start, end, names=None):
+    """Irisan Data_Utama [start, end], dibatasi `names` atau daftar pegawai sah."""
+    try:
+        if names:
+            return get_storage().query_attendance(start, end, names)
+        # Master gagal dimuat -> frame kosong, bukan data tanpa filter
+        return get_master_pegawai().get().saring(get_storage().query_attendance(start, end))
+    except:
+        return ke_tipe(pd.DataFrame(columns=KOLOM_DATA))
 
 now_indo = datetime.utcnow() + timedelta(hours=7)
 str_hari = ["Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu", "Minggu"][now_indo.weekday()]
@@ -567,51 +414,48 @@ elif menu == "Dashboard":
     with col_L: st.markdown("<div class='header-title'>Dashboard Absensi</div><div class='header-subtitle'>Monitoring Kehadiran Outsourcing</div>", unsafe_allow_html=True)
     with col_R: st.markdown(clock_html, unsafe_allow_html=True)
     st.markdown("---")
-    if not df_global.empty:
-        total_p = df_global['Nama'].nunique()
-        lengkap = len(df_global[df_global['Status_Data'].str.contains('Lengkap')])
-        tl = len(df_global[df_global['Status_Data'].str.contains('Tidak')])
+    if not rekap_global.empty:
+        ringkas = ringkasan_dashboard(rekap_global)
+        total_p, lengkap, tl = ringkas['pegawai'], ringkas['lengkap'], ringkas['tidak_lengkap']
         m1, m2, m3 = st.columns(3)
         m1.markdown(f"<div class='metric-card'><h4>👥 Pegawai</h4><h1>{total_p}</h1></div>", unsafe_allow_html=True)
         m2.markdown(f"<div class='metric-card'><h4>✅ Hadir</h4><h1 style='color:#10B981;'>{lengkap}</h1></div>", unsafe_allow_html=True)
         m3.markdown(f"<div class='metric-card'><h4>⚠️ Tdk Lengkap</h4><h1 style='color:#F59E0B;'>{tl}</h1></div>", unsafe_allow_html=True)
         st.write("### 📋 Log Masuk Terakhir")
-        st.dataframe(df_global.sort_values('Tanggal', ascending=False).head(10), use_container_width=True)
+        st.dataframe(ke_teks(SNAPSHOT.terbaru), use_container_width=True, column_config=KOLOM_TAMPIL)
     else: st.info("Database kosong.")
 
 elif menu == "Analisis Pegawai":
     col_L, col_R = st.columns([2, 1])
     with col_L: st.markdown("<div class='header-title'>Analisis Performa</div>", unsafe_allow_html=True)
     with col_R: st.markdown(clock_html, unsafe_allow_html=True)
-    if not df_global.empty:
+    if not rekap_global.empty:
         st.write("---")
         # --- FITUR MULTISELECT FILTER ---
-        all_pegawai = sorted(df_global['Nama'].unique().tolist())
+        all_pegawai = list(SNAPSHOT.nama_rekap)
         c1, c2, c3 = st.columns([1, 1, 2])
         with c1: sel_bulan = st.selectbox("Bulan", range(1, 13), index=datetime.now().month-1, format_func=lambda x: calendar.month_name[x])
         with c2: sel_tahun = st.number_input("Tahun", value=datetime.now().year)
         with c3: sel_nama = st.multiselect("🔍 Cari Pegawai", all_pegawai)
         
-        df_global['Tanggal'] = pd.to_datetime(df_global['Tanggal'])
-        mask = (df_global['Tanggal'].dt.month == sel_bulan) & (df_global['Tanggal'].dt.year == sel_tahun)
-        if sel_nama: mask = mask & (df_global['Nama'].isin(sel_nama))
-        df_filtered = df_global[mask]
+        rekap_filtered = rekap_global[rekap_global['Bulan'] == f"{int(sel_tahun)}-{sel_bulan:02d}"]
+        if sel_nama: rekap_filtered = rekap_filtered[rekap_filtered['Nama'].isin(sel_nama)]
         
-        if not df_filtered.empty:
+        if not rekap_filtered.empty:
             if sel_nama: st.success(f"Data: {len(sel_nama)} Pegawai Terpilih")
             else: st.success("Data: Semua Pegawai")
             
+            import plotly.express as px
             gc1, gc2 = st.columns(2)
             with gc1:
-                chart_data = df_filtered.copy()
-                chart_data['Kategori'] = chart_data['Status_Data'].apply(lambda x: 'Lengkap' if 'Lengkap' in x else ('Tidak Absen Pagi' if 'Pagi' in x else 'Tidak Absen Pulang'))
-                fig = px.bar(chart_data.groupby(['Nama', 'Kategori']).size().reset_index(name='Jumlah'), x='Nama', y='Jumlah', color='Kategori', color_discrete_map={'Lengkap':'#2563EB', 'Tidak Absen Pagi':'#EF553B', 'Tidak Absen Pulang':'#F59E0B'})
+                chart_data = rekap_filtered.assign(Kategori=rekap_filtered['Status_Data'].map(kategori_status))
+                fig = px.bar(chart_data.groupby(['Nama', 'Kategori'])['Jumlah'].sum().reset_index(), x='Nama', y='Jumlah', color='Kategori', color_discrete_map={'Lengkap':'#2563EB', 'Tidak Absen Pagi':'#EF553B', 'Tidak Absen Pulang':'#F59E0B'})
                 st.plotly_chart(fig, use_container_width=True)
             with gc2:
-                pie = df_filtered['Status_Data'].value_counts().reset_index(); pie.columns = ['Status','Jumlah']
+                pie = rekap_filtered.groupby('Status_Data')['Jumlah'].sum().sort_values(ascending=False).reset_index(); pie.columns = ['Status','Jumlah']
                 st.plotly_chart(px.pie(pie, values='Jumlah', names='Status', hole=0.6), use_container_width=True)
-            df_display = df_filtered.copy(); df_display['Tanggal'] = df_display['Tanggal'].dt.date
-            st.dataframe(df_display.sort_values('Tanggal'), use_container_width=True, hide_index=True)
+            df_display = query_attendance(*rentang_bulan(int(sel_tahun), sel_bulan), names=sel_nama)
+            st.dataframe(ke_teks(df_display.sort_values('Tanggal')), use_container_width=True, hide_index=True, column_config=KOLOM_TAMPIL)
         else: st.warning("Data tidak ditemukan.")
     else: st.warning("Database kosong.")
 
@@ -624,23 +468,88 @@ elif menu == "Manajemen Data":
     if USER_ROLE == "Administrator": tabs_list.append("⚠️ Hapus Database")
     mytabs = st.tabs(tabs_list)
     with mytabs[0]: 
-        f = st.file_uploader("Upload .txt", type=['txt'])
-        if f and st.button("Simpan Data"):
-            bar = st.progress(0, text="Membaca Data...")
-            res = process_file(f); bar.progress(60, text="Analisis Cerdas...")
-            if save_data(res):
-                bar.progress(100, text="Berhasil!"); add_log("UPLOAD", f.name); st.success("Selesai!"); st.balloons()
+        files = st.file_uploader("Upload .txt (boleh beberapa mesin sekaligus)", type=['txt'], accept_multiple_files=True)
+        if files and st.button("Simpan Data"):
+            # Ditulis ke antrian persisten; ingest & sinkron cloud berjalan di worker latar
+            get_antrian().kirim([(f.name, f.getvalue()) for f in files], USER_NAME)
+
+        @st.fragment(run_every=1)
+        def panel_upload():
+            # Status dibaca dari antrian, jadi tetap tampil setelah browser di-refresh
+            for job in get_antrian().terbaru(USER_NAME, n=3):
+                label = f"Upload #{job['id']} ({job['dibuat']})"
+                if job['status'] == "menunggu": st.info(f"{label}: menunggu giliran...")
+                elif job['status'] == "proses": st.info(f"{label}: {job['progres'] or 'memproses'}...")
+                elif job['status'] == "gagal":
+                    st.error(f"{label} gagal: {job['galat']}")
+                    for nama, n in (job['hasil'] or {}).get('per_file', []):
+                        if isinstance(n, str): st.caption(f"{nama}: {n}")
+                    # File upload masih tersimpan di antrian; file yang sudah masuk akan dilewati sebagai duplikat
+                    if st.button("Ulangi", key=f"ulangi_{job['id']}"): get_antrian().ulangi(job['id'])
+                else:
+                    hasil = job['hasil']
+                    for nama in hasil['duplikat']: st.caption(f"{nama}: file ini sudah pernah diupload, dilewati.")
+                    if hasil.get('ditolak'):
+                        daftar_tolak = ", ".join(f"{nama} ({n} tap)" for nama, n in sorted(hasil['ditolak'].items()))
+                        st.warning(f"Nama tidak ada di Data_Pegawai, tap ditolak: {daftar_tolak}. "
+                                   "Lengkapi master lalu upload ulang file yang sama.")
+                    for nama, n in hasil['per_file']:
+                        if isinstance(n, str): st.error(f"{nama}: {n}")
+                    if hasil['peringatan']: st.warning(hasil['peringatan'])
+                    gabung = f", digabung dengan {hasil['gabung'] - 1} upload lain" if hasil['gabung'] > 1 else ""
+                    st.success(f"{label} selesai: {hasil['tap_baru']} tap baru{gabung}.")
+        panel_upload()
     with mytabs[1]: 
         c1, c2 = st.columns(2)
         b = c1.selectbox("Laporan Bulan", range(1,13), index=datetime.now().month-1); t = c2.number_input("Laporan Tahun", value=datetime.now().year)
         if st.button("Proses PDF"):
-            df_global['Tanggal'] = pd.to_datetime(df_global['Tanggal'])
-            df_filt = df_global[(df_global['Tanggal'].dt.month == b) & (df_global['Tanggal'].dt.year == t)]
+            df_filt = query_attendance(*rentang_bulan(int(t), b))
             if not df_filt.empty:
-                df_filt['Tanggal'] = df_filt['Tanggal'].dt.date
-                pdf = generate_pdf(df_filt, t, b); add_log("DOWNLOAD", f"PDF {b}/{t}")
+                from laporan import VERSI_LAYOUT_PDF, generate_pdf
+                kunci_pdf = PdfCache.kunci(df_filt, t, b, VERSI_LAYOUT_PDF)
+                pdf = get_pdf_cache().get(t, b, kunci_pdf)
+                if pdf is None:
+                    pdf = generate_pdf(df_filt, t, b)
+                    get_pdf_cache().put(t, b, kunci_pdf, pdf)
+                add_log("DOWNLOAD", f"PDF {b}/{t}")
                 st.download_button("Unduh PDF", pdf, f"Laporan Absensi Outsourcing Bulan {b} Tahun {t}.pdf", "application/pdf")
             else: st.error("Data kosong.")
+
+        # --- EKSPOR MASSAL (multi bulan / per pegawai, dirender paralel) ---
+        st.write("---")
+        st.markdown("**Ekspor Massal (ZIP)**")
+        e1, e2, e3, e4 = st.columns(4)
+        b_awal = e1.selectbox("Dari Bulan", range(1,13), index=0, format_func=lambda x: calendar.month_name[x])
+        t_awal = e2.number_input("Dari Tahun", value=datetime.now().year)
+        b_akhir = e3.selectbox("Sampai Bulan", range(1,13), index=datetime.now().month-1, format_func=lambda x: calendar.month_name[x])
+        t_akhir = e4.number_input("Sampai Tahun", value=datetime.now().year)
+        per_pegawai = st.radio("Isi ZIP", ["Satu laporan per bulan", "Laporan per pegawai per bulan"], horizontal=True) != "Satu laporan per bulan"
+        if st.button("Mulai Ekspor"):
+            from laporan import BatchExport, buat_jobs
+            periode = [(y, m) for y in range(int(t_awal), int(t_akhir)+1) for m in range(1, 13)
+                       if (int(t_awal), b_awal) <= (y, m) <= (int(t_akhir), b_akhir)]
+            jobs = []
+            if periode:
+                df_periode = query_attendance(rentang_bulan(*periode[0])[0], rentang_bulan(*periode[-1])[1])
+                jobs = buat_jobs(df_periode, periode, per_pegawai)
+            if not jobs: st.error("Data kosong.")
+            else:
+                lama = st.session_state.get('ekspor_batch')
+                if lama is not None and lama.done: lama.cleanup()
+                st.session_state['ekspor_batch'] = BatchExport(jobs).start()
+                add_log("DOWNLOAD", f"ZIP {b_awal}/{t_awal} - {b_akhir}/{t_akhir} ({len(jobs)} laporan)")
+
+        @st.fragment(run_every=1)
+        def panel_ekspor():
+            # Dirender ulang tiap detik tanpa menjalankan ulang seluruh halaman
+            batch = st.session_state.get('ekspor_batch')
+            if batch is None: return
+            if batch.error: st.error(f"Ekspor gagal: {batch.error}")
+            elif not batch.done: st.progress(batch.selesai / batch.total, text=f"Merender {batch.selesai}/{batch.total} laporan...")
+            else:
+                with open(batch.zip_path, 'rb') as f:
+                    st.download_button("Unduh ZIP", f.read(), "Laporan Absensi Outsourcing.zip", "application/zip")
+        panel_ekspor()
     if USER_ROLE == "Administrator":
         with mytabs[2]:
             st.error("⚠️ PERHATIAN: Hapus data bersifat permanen!")
@@ -655,8 +564,61 @@ elif menu == "System Logs":
     with col_R:
         st.markdown(clock_html, unsafe_allow_html=True)
     st.write("---")
-    if st.button("🔄 Refresh Log"): st.cache_data.clear(); st.rerun()
-    log_df = get_logs()
-    if not log_df.empty: st.dataframe(log_df.sort_values(by="Waktu", ascending=False), use_container_width=True, hide_index=True)
+    # Hanya satu halaman yang diambil dari storage, sudah tersaring & terurut terbaru dulu
+    opsi_aksi, opsi_pengguna = get_storage().opsi_log()
+    hari_ini = (datetime.utcnow() + timedelta(hours=7)).date()
+    f1, f2, f3, f4 = st.columns([2, 2, 2, 1])
+    aksi_dipilih = f1.multiselect("Aksi", opsi_aksi)
+    pengguna_dipilih = f2.multiselect("User", opsi_pengguna)
+    rentang_log = f3.date_input("Rentang Tanggal", value=(hari_ini - timedelta(days=30), hari_ini))
+    per_halaman = f4.selectbox("Baris", [50, 100, 200])
+    dari_log = rentang_log[0] if len(rentang_log) > 0 else None
+    sampai_log = rentang_log[1] if len(rentang_log) > 1 else dari_log
+
+    halaman = st.session_state.get('log_halaman', 1)
+    try:
+        log_df, total_log = get_storage().query_logs(aksi_dipilih, pengguna_dipilih, dari_log, sampai_log,
+                                                     halaman - 1, per_halaman)
+        if log_df.empty and halaman > 1:  # filter berubah: pindah ke halaman terakhir yang ada
+            halaman = max(1, -(-total_log // per_halaman))
+            log_df, total_log = get_storage().query_logs(aksi_dipilih, pengguna_dipilih, dari_log, sampai_log,
+                                                         halaman - 1, per_halaman)
+    except Exception as e:
+        st.error(f"Gagal membaca log: {e}")
+        log_df, total_log, halaman = pd.DataFrame(), 0, 1
+    jumlah_halaman = max(1, -(-total_log // per_halaman))
+    st.session_state['log_halaman'] = halaman
+
+    if log_df.empty:
+        st.info("Tidak ada log untuk filter ini.")
+    else:
+        st.dataframe(log_df, use_container_width=True, hide_index=True)
+    n1, n2, n3 = st.columns([1, 2, 1])
+    n1.number_input("Halaman", min_value=1, max_value=jumlah_halaman, step=1, key='log_halaman')
+    n2.caption(f"{total_log} log • halaman {halaman} dari {jumlah_halaman}")
+    if n3.button("🔄 Refresh Log"): st.rerun()
+
+elif menu == "Performance":
+    col_L, col_R = st.columns([2, 1])
+    with col_L:
+        st.markdown("<div class='header-title'>Performance</div>", unsafe_allow_html=True)
+        st.markdown("<div class='header-subtitle'>Durasi operasi baca/tulis & proses sejak server dijalankan</div>", unsafe_allow_html=True)
+    with col_R:
+        st.markdown(clock_html, unsafe_allow_html=True)
+    st.write("---")
+    ringkas_metrik = metrik.ringkasan()
+    if ringkas_metrik.empty:
+        st.info("Belum ada operasi yang tercatat.")
+    else:
+        st.dataframe(ringkas_metrik, use_container_width=True, hide_index=True)
+        spans = metrik.semua().sort_values('waktu', ascending=False)
+        spans['waktu'] = pd.to_datetime(spans['waktu'], unit='s') + timedelta(hours=7)
+        st.caption(f"{len(spans)} span terakhir (maks. {metrik.KAPASITAS})")
+        st.dataframe(spans, use_container_width=True, hide_index=True)
+        c1, c2 = st.columns(2)
+        c1.download_button("⬇️ Unduh Metrik (CSV)", spans.to_csv(index=False).encode(), "metrik_absensi.csv", "text/csv")
+        if c2.button("🗑️ Reset Metrik"): metrik.reset(); st.rerun()
+    if metrik.FILE_EKSPOR:
+        st.caption(f"Metrik juga ditulis ke {metrik.FILE_EKSPOR}")
 
-#coba#
\ No newline at end of file
+metrik.catat(f"app.render:{menu}", time_lib.perf_counter() - _T0)
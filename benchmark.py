@@ -0,0 +1,232 @@
+"""Benchmark pipeline absensi dengan export mesin sintetis.
+
+Mengukur tiap tahap (parse, pairing, ingest inkremental, simpan/dedup, agregasi dashboard, render PDF) untuk
+kombinasi jumlah pegawai x panjang histori, memakai backend SQLite sementara (tanpa
+Google Sheets). Hasil ditulis ke JSON supaya bisa dibandingkan antar build:
+
+    python benchmark.py --pegawai 10 100 1000 --bulan 1 12 -o benchmark_hasil.json
+    python benchmark.py --pegawai 5000 --bulan 24 --bandingkan benchmark_lama.json
+
+Skenario "startup" mengukur waktu import modul yang dimuat app.py di proses baru.
+Kode keluar 1 bila --bandingkan menemukan tahap yang lebih lambat dari --ambang.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from core import pair_shifts, process_file, read_taps, ringkasan_dashboard, siapkan_ingest, simpan_ingest
+from laporan import generate_pdf
+from storage import SQLiteStorage
+
+
+# --- GENERATOR EXPORT MESIN ---
+def generate_export(n_pegawai, n_bulan, sep='\t', n_mesin=3, seed=0, mulai=datetime(2025, 1, 1)):
+    """Export mesin sintetis (bytes), diurutkan waktu seperti keluaran mesin fingerprint.
+
+    Pola: shift pagi (07-08 / 16-17), shift malam (19-22 / pagi berikutnya), tap berulang,
+    lupa absen pulang/pagi, libur akhir pekan, dan beberapa mesin (kolom Mch).
+    """
+    r = random.Random(seed)
+    akhir = mulai + timedelta(days=round(n_bulan * 30.4))
+    taps = []
+    for emp in range(n_pegawai):
+        nama = f"Pegawai {emp:05d}"
+        malam = r.random() < 0.2  # sebagian pegawai shift malam
+        hari = mulai
+        while hari < akhir:
+            if hari.weekday() >= 5 and r.random() < 0.8:
+                hari += timedelta(days=1)
+                continue
+            if r.random() < 0.05:  # tidak masuk
+                hari += timedelta(days=1)
+                continue
+            if malam:
+                masuk = hari + timedelta(hours=r.randint(19, 21), minutes=r.randint(0, 59))
+                pulang = hari + timedelta(days=1, hours=r.randint(5, 7), minutes=r.randint(0, 59))
+            else:
+                masuk = hari + timedelta(hours=7, minutes=r.randint(0, 59))
+                pulang = hari + timedelta(hours=16, minutes=r.randint(0, 90))
+            kejadian = r.random()
+            if kejadian < 0.05:
+                pulang = None  # lupa absen pulang
+            elif kejadian < 0.08:
+                masuk = None  # lupa absen pagi
+            for t in (masuk, pulang):
+                if t is None:
+                    continue
+                taps.append((t, emp, nama))
+                if r.random() < 0.1:  # tap berulang
+                    taps.append((t + timedelta(seconds=r.randint(1, 40)), emp, nama))
+            hari += timedelta(days=1)
+    taps.sort()
+    buf = io.StringIO()
+    for t, emp, nama in taps:
+        buf.write(sep.join([str(emp), t.strftime('%Y-%m-%d %H:%M:%S'), str(emp % n_mesin + 1), '1', nama, '0', '0', '0']) + "\n")
+    return buf.getvalue().encode()
+
+
+# --- PENGUKURAN ---
+def ukur(fn, ulang):
+    """Waktu terbaik dari `ulang` kali jalan (detik) dan hasil jalan terakhir."""
+    terbaik, hasil = None, None
+    for _ in range(ulang):
+        t0 = time.perf_counter()
+        hasil = fn()
+        durasi = time.perf_counter() - t0
+        terbaik = durasi if terbaik is None else min(terbaik, durasi)
+    return terbaik, hasil
+
+
+def ingest(storage, isi):
+    hasil = siapkan_ingest(storage, [("bench.txt", isi)])
+    simpan_ingest(storage, hasil)
+    return hasil
+
+
+def jalankan(n_pegawai, n_bulan, sep, ulang, pdf_maks_pegawai):
+    data = generate_export(n_pegawai, n_bulan, sep=sep)
+    label = f"{n_pegawai}p-{n_bulan}b-{'tab' if sep == chr(9) else 'koma'}"
+    hasil = []
+
+    def catat(tahap, detik, baris):
+        hasil.append({'skenario': label, 'pegawai': n_pegawai, 'bulan': n_bulan, 'tahap': tahap,
+                      'detik': round(detik, 6), 'baris': int(baris), 'bytes': len(data)})
+        print(f"{label:<22} {tahap:<12} {detik:9.3f}s  {baris:>9} baris")
+
+    detik, taps = ukur(lambda: pd.concat(read_taps(io.BytesIO(data)), ignore_index=True), ulang)
+    catat('parse', detik, len(taps))
+    detik, df = ukur(lambda: pair_shifts(taps), ulang)
+    catat('pairing', detik, len(df))
+    detik, df = ukur(lambda: process_file(io.BytesIO(data)), ulang)
+    catat('proses_file', detik, len(df))
+
+    # Jalur upload (sidik file, registri tap, pair_inkremental): 90% awal histori, lalu susulan
+    # 20% terakhir yang bertumpuk dengan upload pertama. Sekali jalan: ingest mengubah storage.
+    baris_export = data.splitlines(keepends=True)
+    awal, susul = b"".join(baris_export[:len(baris_export) * 9 // 10]), b"".join(baris_export[len(baris_export) * 8 // 10:])
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, "ingest.sqlite"))
+        for tahap, isi in [('ingest_awal', awal), ('ingest_susul', susul)]:
+            detik, hasil_ingest = ukur(lambda: ingest(storage, isi), 1)
+            catat(tahap, detik, len(hasil_ingest['baris']))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, "bench.sqlite"))
+        detik, _ = ukur(lambda: storage.save_data(df), 1)
+        catat('simpan_baru', detik, len(df))
+        detik, _ = ukur(lambda: storage.save_data(df), ulang)  # semua baris sudah ada: jalur dedup
+        catat('simpan_dedup', detik, len(df))
+        detik, semua = ukur(storage.get_data, ulang)
+        catat('baca_data', detik, len(semua))
+
+        detik, _ = ukur(lambda: (ringkasan_dashboard(storage.get_rekap()), storage.get_terbaru(10)), ulang)
+        catat('dashboard', detik, len(semua))
+
+    if n_pegawai <= pdf_maks_pegawai:
+        tgl = pd.to_datetime(semua['Tanggal'])
+        bulan = semua[((tgl.dt.year == 2025) & (tgl.dt.month == 1)).to_numpy()]
+        detik, _ = ukur(lambda: generate_pdf(bulan, 2025, 1), ulang)
+        catat('pdf', detik, len(bulan))
+    return hasil
+
+
+# Modul yang dimuat app.py: dasar (halaman login) dan yang di-import lazy per halaman
+MODUL_STARTUP = ["streamlit", "core", "storage", "plotly.express", "laporan", "streamlit_option_menu", "streamlit_gsheets"]
+
+
+def ukur_startup(ulang):
+    """Waktu import tiap modul di proses Python baru (cold start), terbaik dari `ulang` kali."""
+    hasil = []
+    kode = "import sys, time; t = time.perf_counter(); import {0}; print(time.perf_counter() - t)"
+    for modul in MODUL_STARTUP:
+        waktu = []
+        for _ in range(ulang):
+            proc = subprocess.run([sys.executable, "-c", kode.format(modul)], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+            if proc.returncode != 0:
+                break
+            waktu.append(float(proc.stdout.strip().splitlines()[-1]))
+        if not waktu:
+            print(f"{'startup':<22} import:{modul:<20} (tidak terpasang)")
+            continue
+        hasil.append({'skenario': 'startup', 'pegawai': 0, 'bulan': 0, 'tahap': f"import:{modul}",
+                      'detik': round(min(waktu), 6), 'baris': 0, 'bytes': 0})
+        print(f"{'startup':<22} import:{modul:<20} {min(waktu):9.3f}s")
+    return hasil
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+
+def bandingkan(hasil, path_lama, ambang):
+    with open(path_lama) as f:
+        lama = {(h['skenario'], h['tahap']): h['detik'] for h in json.load(f)['hasil']}
+    regresi = []
+    for h in hasil:
+        sebelum = lama.get((h['skenario'], h['tahap']))
+        if not sebelum:
+            continue
+        rasio = h['detik'] / sebelum
+        tanda = "⚠️" if rasio > ambang else "  "
+        print(f"{tanda} {h['skenario']:<22} {h['tahap']:<12} {sebelum:9.3f}s -> {h['detik']:9.3f}s  x{rasio:.2f}")
+        if rasio > ambang:
+            regresi.append(h)
+    return regresi
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline absensi")
+    parser.add_argument("--pegawai", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--bulan", type=int, nargs="+", default=[1, 12])
+    parser.add_argument("--separator", choices=["tab", "koma", "keduanya"], default="tab")
+    parser.add_argument("--ulang", type=int, default=3, help="jumlah pengulangan, diambil yang tercepat")
+    parser.add_argument("--pdf-maks-pegawai", type=int, default=1000, help="lewati render PDF di atas jumlah ini")
+    parser.add_argument("--tanpa-startup", action="store_true", help="lewati pengukuran waktu import (cold start)")
+    parser.add_argument("-o", "--output", default="benchmark_hasil.json")
+    parser.add_argument("--bandingkan", help="file JSON hasil sebelumnya")
+    parser.add_argument("--ambang", type=float, default=1.25, help="rasio waktu yang dianggap regresi")
+    args = parser.parse_args(argv)
+
+    seps = {"tab": ["\t"], "koma": [","], "keduanya": ["\t", ","]}[args.separator]
+    hasil = [] if args.tanpa_startup else ukur_startup(args.ulang)
+    for n_pegawai in args.pegawai:
+        for n_bulan in args.bulan:
+            for sep in seps:
+                hasil += jalankan(n_pegawai, n_bulan, sep, args.ulang, args.pdf_maks_pegawai)
+
+    laporan = {
+        'meta': {
+            'waktu': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'mesin': platform.platform(),
+        },
+        'hasil': hasil,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(laporan, f, indent=2)
+    print(f"✅ Hasil ditulis ke {args.output}")
+
+    if args.bandingkan:
+        return 1 if bandingkan(hasil, args.bandingkan, args.ambang) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
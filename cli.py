@@ -0,0 +1,171 @@
+"""CLI tanpa UI untuk batch harian (cron): ingest export mesin, laporan PDF, ekspor ZIP.
+
+Contoh:
+    python cli.py ingest /data/mesin/*.txt --workers 4
+    python cli.py report --tahun 2026 --bulan 1 -o rekap_2026_01.pdf
+    python cli.py export --dari 2026-01 --sampai 2026-12 --per-pegawai -o rekap_2026.zip
+
+Kode keluar: 0 sukses, 1 sebagian file gagal, 2 argumen salah, 3 data kosong, 4 storage gagal
+(termasuk galat tak terduga lain), 5 ingest tersimpan tetapi ada tap ditolak (nama tidak ada di Data_Pegawai).
+"""
+import argparse
+import os
+import shutil
+import sys
+from datetime import datetime, timedelta
+
+from core import rentang_bulan, siapkan_ingest, simpan_ingest
+from laporan import BatchExport, buat_jobs, generate_pdf
+from pegawai import MasterPegawai
+from storage import MirrorGagal, PdfCache, buat_storage
+
+EXIT_OK = 0
+EXIT_SEBAGIAN_GAGAL = 1
+EXIT_ARGUMEN = 2
+EXIT_DATA_KOSONG = 3
+EXIT_STORAGE = 4
+EXIT_TAP_DITOLAK = 5
+
+MODE_STORAGE = os.environ.get("ABSENSI_STORAGE", "sqlite+gsheets")
+DIR_LOKAL = os.environ.get("ABSENSI_DIR_LOKAL", ".data_lokal")
+
+
+def buka_storage():
+    conn = None
+    if MODE_STORAGE != "sqlite":
+        # Koneksi yang sama dengan app.py (membaca .streamlit/secrets.toml)
+        import streamlit as st
+        from streamlit_gsheets import GSheetsConnection
+        conn = st.connection("gsheets", type=GSheetsConnection)
+    return buat_storage(MODE_STORAGE, DIR_LOKAL, conn)
+
+
+def tulis_log(storage, aksi, detail):
+    now = (datetime.utcnow() + timedelta(hours=7)).strftime("%Y-%m-%d %H:%M:%S")
+    storage.add_logs([{"Waktu": now, "Aksi": aksi, "Detail": f"[CLI] {detail}"}])
+
+
+def query_pegawai_sah(storage, start, end):
+    """Irisan Data_Utama [start, end] milik pegawai master (seperti app.py); master kosong = semua."""
+    return MasterPegawai(storage).get().saring(storage.query_attendance(start, end))
+
+
+def _bulan(teks):
+    try:
+        tgl = datetime.strptime(teks, "%Y-%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"format bulan harus YYYY-MM: {teks}")
+    return tgl.year, tgl.month
+
+
+def cmd_ingest(args, storage):
+    ingest = siapkan_ingest(storage, [(path, path) for path in args.files], max_workers=args.workers)
+    gagal = [(path, res) for path, res in ingest['per_file'] if isinstance(res, Exception)]
+    sukses = [path for path, res in ingest['per_file'] if not isinstance(res, Exception)]
+    for path in ingest['duplikat']:
+        print(f"⏭️ {path}: sudah pernah di-ingest, dilewati.")
+    for nama, n in sorted(ingest['ditolak'].items()):
+        print(f"⚠️ {nama}: tidak ada di Data_Pegawai, {n} tap ditolak.", file=sys.stderr)
+    for path, err in gagal:
+        print(f"❌ {path}: {err}", file=sys.stderr)
+
+    if not sukses:
+        if ingest['duplikat'] and not gagal:
+            return EXIT_OK
+        print("Tidak ada data yang bisa disimpan.", file=sys.stderr)
+        return EXIT_SEBAGIAN_GAGAL if gagal else EXIT_DATA_KOSONG
+
+    galat = None
+    try:
+        berubah = simpan_ingest(storage, ingest, PdfCache(os.path.join(DIR_LOKAL, "cache_pdf")))
+    except MirrorGagal as e:
+        galat = e  # data sudah tersimpan lokal: upload tetap dicatat sebelum galat diteruskan ke main
+    for path in sukses:
+        tulis_log(storage, "UPLOAD", os.path.basename(path))
+    if galat is not None:
+        raise galat
+    print(f"✅ {len(sukses)} file diproses, {len(ingest['taps'])} tap baru, {len(berubah)} baris baru/berubah.")
+    if gagal:
+        return EXIT_SEBAGIAN_GAGAL
+    return EXIT_TAP_DITOLAK if ingest['ditolak'] else EXIT_OK
+
+
+def cmd_report(args, storage):
+    df = query_pegawai_sah(storage, *rentang_bulan(args.tahun, args.bulan))
+    if df.empty:
+        print("Data kosong.", file=sys.stderr)
+        return EXIT_DATA_KOSONG
+    output = args.output or f"Laporan Absensi Outsourcing Bulan {args.bulan} Tahun {args.tahun}.pdf"
+    with open(output, 'wb') as f:
+        f.write(generate_pdf(df, args.tahun, args.bulan))
+    tulis_log(storage, "DOWNLOAD", f"PDF {args.bulan}/{args.tahun}")
+    print(f"✅ {output}")
+    return EXIT_OK
+
+
+def cmd_export(args, storage):
+    if args.sampai < args.dari:
+        print("--sampai harus setelah --dari.", file=sys.stderr)
+        return EXIT_ARGUMEN
+    periode = [(y, m) for y in range(args.dari[0], args.sampai[0] + 1) for m in range(1, 13)
+               if args.dari <= (y, m) <= args.sampai]
+    df = query_pegawai_sah(storage, rentang_bulan(*args.dari)[0], rentang_bulan(*args.sampai)[1])
+    jobs = buat_jobs(df, periode, args.per_pegawai)
+    if not jobs:
+        print("Data kosong.", file=sys.stderr)
+        return EXIT_DATA_KOSONG
+    batch = BatchExport(jobs, max_workers=args.workers).start()
+    batch.thread.join()
+    if batch.error:
+        print(f"❌ Ekspor gagal: {batch.error}", file=sys.stderr)
+        return EXIT_SEBAGIAN_GAGAL
+    shutil.move(batch.zip_path, args.output)
+    tulis_log(storage, "DOWNLOAD", f"ZIP {args.dari[1]}/{args.dari[0]} - {args.sampai[1]}/{args.sampai[0]} ({batch.total} laporan)")
+    print(f"✅ {batch.total} laporan -> {args.output}")
+    return EXIT_OK
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sistem Absensi BP3MI - mode batch tanpa UI")
+    sub = parser.add_subparsers(dest="perintah", required=True)
+
+    p = sub.add_parser("ingest", help="proses & simpan file export mesin (.txt)")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--workers", type=int, default=None, help="jumlah proses paralel")
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("report", help="laporan PDF satu bulan")
+    p.add_argument("--tahun", type=int, required=True)
+    p.add_argument("--bulan", type=int, required=True, choices=range(1, 13))
+    p.add_argument("-o", "--output")
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("export", help="ZIP laporan beberapa bulan")
+    p.add_argument("--dari", type=_bulan, required=True, help="YYYY-MM")
+    p.add_argument("--sampai", type=_bulan, required=True, help="YYYY-MM")
+    p.add_argument("--per-pegawai", action="store_true", help="satu PDF per pegawai per bulan")
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("-o", "--output", required=True)
+    p.set_defaults(func=cmd_export)
+
+    args = parser.parse_args(argv)
+    try:
+        storage = buka_storage()
+    except Exception as e:
+        print(f"❌ Storage gagal dibuka: {e}", file=sys.stderr)
+        return EXIT_STORAGE
+    try:
+        kode = args.func(args, storage)
+    except MirrorGagal as e:
+        print(f"⚠️ Tersimpan lokal, sinkron cloud gagal: {e}", file=sys.stderr)
+        kode = EXIT_STORAGE
+    except Exception as e:
+        # Cron cukup membaca kode keluar; traceback tidak membedakan galat storage dari galat lain
+        print(f"❌ {type(e).__name__}: {e}", file=sys.stderr)
+        kode = EXIT_STORAGE
+    storage.flush_logs()
+    return kode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
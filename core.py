@@ -0,0 +1,512 @@
+"""Inti pemrosesan absensi: parsing export mesin, pairing shift, simpan & laporan.
+
+Tidak bergantung pada Streamlit; dipakai oleh app.py maupun cli.py.
+"""
+import calendar
+import hashlib
+import io
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from metrik import span
+from pegawai import MasterPegawai
+from storage import KOLOM_DATA, KOLOM_TAP, KUNCI_TAP, MirrorGagal
+
+# --- PROSES FILE (ANTI-OVERLAP SHIFT LOGIC) ---
+KOLOM_MESIN = ['ID', 'Timestamp', 'Mch', 'Cd', 'Nama', 'Status', 'X1', 'X2']
+FORMAT_WAKTU = '%Y-%m-%d %H:%M:%S'
+UKURAN_CHUNK = 100_000                          # baris per chunk saat membaca export mesin
+JAM_SIANG = pd.Timedelta(hours=13)              # batas log pagi (< 13:00)
+BATAS_MALAM = pd.Timedelta(hours=17, minutes=30)  # awal shift malam
+DURASI_MALAM = pd.Timedelta(hours=3)            # durasi minimal shift malam di hari yang sama
+STATUS_MALAM = "Lengkap (Malam)"                # shift malam yang memakai tap pagi keesokan harinya
+PERPANJANG_JENDELA = pd.Timedelta(days=7)       # langkah perpanjangan jendela pairing inkremental
+
+def _klasifikasi_hari(first, last):
+    """Klasifikasi per hari dari tap pertama dan terakhir (last = NaT jika hanya satu tap).
+
+    Return (jam_masuk, jam_pulang, status, malam_terbuka). `malam_terbuka` menandai
+    shift malam yang belum punya jam pulang dan boleh meminjam tap pagi keesokan harinya.
+    """
+    jam_first = first.dt.strftime('%H:%M:%S').to_numpy(dtype=object)
+    jam_last = last.dt.strftime('%H:%M:%S').fillna('-').to_numpy(dtype=object)
+    waktu = (first - first.dt.normalize()).to_numpy()
+    ada_last = last.notna().to_numpy()
+
+    pagi = waktu < JAM_SIANG.to_timedelta64()
+    ambigu = ~pagi & (waktu < BATAS_MALAM.to_timedelta64())
+    malam = ~pagi & ~ambigu
+    malam_lengkap = malam & ada_last & ((last - first).to_numpy() > DURASI_MALAM.to_timedelta64())
+    hanya_pulang = ambigu & ~ada_last
+    malam_terbuka = malam & ~malam_lengkap
+
+    jam_masuk = np.where(hanya_pulang, '-', jam_first).astype(object)
+    jam_pulang = np.select([hanya_pulang, malam_terbuka], [jam_first, '-'], jam_last).astype(object)
+    status = np.select(
+        [hanya_pulang, ada_last & ~malam_terbuka],
+        ["Tidak Absen Pagi", "Lengkap (Normal)"],
+        "Tidak Absen Pulang",
+    ).astype(object)
+    return jam_masuk, jam_pulang, status, malam_terbuka
+
+def _pair_days(taps, dipinjam_awal=()):
+    """Inti pairing. Return frame per (Nama, Tanggal) dengan kolom data + flag `pinjam`/`dipinjam`/`kosong`.
+
+    `dipinjam_awal` berisi kunci (Nama, Tanggal) yang tap pertamanya sudah dipakai shift malam
+    hari sebelumnya (dipakai parser streaming untuk hari yang dibawa antar chunk, dan pairing
+    inkremental untuk hari pertama tiap jendela).
+    """
+    taps = taps[['Nama', 'Timestamp']].dropna().sort_values(['Nama', 'Timestamp'], kind='mergesort')
+    if taps.empty:
+        return pd.DataFrame(columns=KOLOM_DATA + ['pinjam', 'dipinjam', 'kosong'])
+
+    ts = taps['Timestamp']
+    kunci = [taps['Nama'], ts.dt.normalize().rename('Tanggal')]
+    grp = ts.groupby(kunci, sort=True)
+    first, last, n = grp.first(), grp.last(), grp.size()
+
+    # Varian "dipinjam": tap pertama (beserta duplikatnya) sudah dipakai shift malam kemarin
+    is_first = ts == grp.transform('first')
+    n_sisa = n - is_first.groupby(kunci, sort=True).sum()
+    first_sisa = ts.where(~is_first).groupby(kunci, sort=True).min()
+
+    masuk_a, pulang_a, status_a, terbuka_a = _klasifikasi_hari(first, last.where(n > 1))
+    masuk_r, pulang_r, status_r, terbuka_r = _klasifikasi_hari(first_sisa, last.where(n_sisa > 1))
+    ada_sisa = (n_sisa > 0).to_numpy()
+
+    # Lookup hari berikutnya (baris selanjutnya milik pegawai yang sama & tanggal +1)
+    nama = first.index.get_level_values('Nama').to_numpy()
+    tgl = first.index.get_level_values('Tanggal')
+    sama_next = np.append(nama[1:] == nama[:-1], False)
+    sama_prev = np.insert(sama_next[:-1], 0, False)
+    selisih = np.append((tgl[1:] - tgl[:-1]).to_numpy(), np.timedelta64('NaT'))
+    besok_ada = sama_next & (selisih == np.timedelta64(1, 'D'))
+    first_besok = first.shift(-1)
+    waktu_besok = (first_besok - first_besok.dt.normalize()).to_numpy()
+    bisa_pinjam = besok_ada & (waktu_besok < JAM_SIANG.to_timedelta64())
+
+    pinjam_a = terbuka_a & bisa_pinjam
+    pinjam_r = terbuka_r & bisa_pinjam & ada_sisa
+    # Kunci awal hanya berlaku bila hari sebelumnya tidak ikut dipairing (awal pegawai/awal jendela)
+    lanjut = np.insert(besok_ada[:-1], 0, False)
+    awal = ~lanjut & first.index.isin(list(dipinjam_awal))
+
+    # pinjam[i] hanya bergantung pada pinjam[i-1]; iterasi sampai stabil (= panjang rantai terpanjang)
+    pinjam = pinjam_a
+    while True:
+        dipinjam = awal | (sama_prev & np.insert(pinjam[:-1], 0, False))
+        pinjam_baru = np.where(dipinjam, pinjam_r, pinjam_a)
+        if np.array_equal(pinjam_baru, pinjam):
+            break
+        pinjam = pinjam_baru
+
+    jam_masuk = np.where(dipinjam, masuk_r, masuk_a)
+    jam_pulang = np.where(dipinjam, pulang_r, pulang_a)
+    status = np.where(dipinjam, status_r, status_a)
+    jam_pulang = np.where(pinjam, first_besok.dt.strftime('%H:%M:%S').to_numpy(dtype=object), jam_pulang)
+    status = np.where(pinjam, STATUS_MALAM, status)
+
+    return pd.DataFrame({
+        'Nama': nama,
+        'Tanggal': tgl,
+        'Jam_Masuk': jam_masuk,
+        'Jam_Pulang': jam_pulang,
+        'Status_Data': status,
+        'pinjam': pinjam,
+        'dipinjam': dipinjam,
+        # Hari yang seluruh tapnya terpakai untuk shift malam kemarin tidak menghasilkan baris
+        'kosong': dipinjam & ~ada_sisa,
+    })
+
+def _format_hasil(hari):
+    res = hari.loc[~hari['kosong'].astype(bool), KOLOM_DATA].copy()
+    res['Tanggal'] = pd.DatetimeIndex(res['Tanggal']).date
+    return res.reset_index(drop=True)
+
+def pair_shifts(df):
+    """Pasangkan tap mesin (kolom Nama, Timestamp) menjadi baris absensi harian.
+
+    Versi vektor dari logika anti-overlap: agregasi tap pertama/terakhir per hari,
+    lookup hari berikutnya lewat shift, lalu rantai "pinjam tap pagi besok" untuk
+    shift malam diselesaikan dengan iterasi titik tetap.
+    """
+    return _format_hasil(_pair_days(df))
+
+class _TapTidakUrut(Exception):
+    """Chunk berisi tap yang lebih awal dari hari yang sudah diproses (file tidak urut waktu)."""
+
+class ShiftPairer:
+    """Pairing bertahap untuk parser streaming.
+
+    Hari terakhir tiap pegawai ditahan (beserta status "dipinjam"-nya) sampai chunk
+    berikutnya datang, karena shift malam bisa meminjam tap pagi keesokan harinya.
+    """
+    def __init__(self):
+        self.sisa = pd.DataFrame({'Nama': pd.Series(dtype=object), 'Timestamp': pd.Series(dtype='datetime64[ns]')})
+        self.sisa_dipinjam = set()
+
+    def feed(self, taps):
+        taps = taps[['Nama', 'Timestamp']].dropna()
+        if not self.sisa.empty and not taps.empty:
+            awal_sisa = self.sisa.groupby('Nama')['Timestamp'].min()
+            awal_baru = taps.groupby('Nama')['Timestamp'].min()
+            awal_sisa, awal_baru = awal_sisa.align(awal_baru, join='inner')
+            if (awal_baru < awal_sisa).any():
+                raise _TapTidakUrut()
+
+        gabung = pd.concat([self.sisa, taps], ignore_index=True)
+        hari = _pair_days(gabung, self.sisa_dipinjam)
+        if hari.empty:
+            return _format_hasil(hari)
+
+        akhir = hari['Tanggal'] == hari.groupby('Nama')['Tanggal'].transform('max')
+        tgl_akhir = hari.loc[akhir].set_index('Nama')['Tanggal']
+        tgl_tap = gabung['Timestamp'].dt.normalize()
+        self.sisa = gabung[tgl_tap.eq(gabung['Nama'].map(tgl_akhir)).to_numpy()]
+        bawa = hari[akhir & hari['dipinjam']]
+        self.sisa_dipinjam = set(zip(bawa['Nama'], bawa['Tanggal']))
+        return _format_hasil(hari[~akhir])
+
+    def finish(self):
+        hari = _pair_days(self.sisa, self.sisa_dipinjam)
+        self.sisa = self.sisa.iloc[0:0]
+        self.sisa_dipinjam = set()
+        return _format_hasil(hari)
+
+def _sniff_separator(file):
+    awal = file.read(4096)
+    file.seek(0)
+    if isinstance(awal, bytes):
+        awal = awal.decode('utf-8', errors='ignore')
+    baris_pertama = awal.splitlines()[0] if awal else ""
+    return '\t' if '\t' in baris_pertama else ','
+
+def read_taps(file, chunksize=UKURAN_CHUNK, kunci=False):
+    """Baca export mesin per chunk, hanya kolom Timestamp & Nama (plus ID & Mch bila `kunci`).
+
+    Separator dideteksi sekali dari byte awal. Timestamp diparse dengan format eksplisit;
+    nilai yang tidak cocok format jatuh ke parser umum agar tidak ada data yang hilang.
+    """
+    sep = _sniff_separator(file)
+    kolom = KOLOM_TAP if kunci else ['Timestamp', 'Nama']
+    with pd.read_csv(file, sep=sep, header=None, names=KOLOM_MESIN, usecols=kolom,
+                     dtype=str, chunksize=chunksize) as reader:
+        for chunk in reader:
+            raw = chunk['Timestamp'].str.strip()
+            waktu = pd.to_datetime(raw, format=FORMAT_WAKTU, errors='coerce')
+            gagal = waktu.isna() & raw.notna()
+            if gagal.any():
+                waktu[gagal] = pd.to_datetime(raw[gagal])
+            taps = pd.DataFrame({'Nama': chunk['Nama'].str.strip(), 'Timestamp': waktu})
+            if kunci:
+                taps['ID'] = chunk['ID'].str.strip()
+                taps['Mch'] = chunk['Mch'].str.strip()
+            yield taps
+
+def _ukuran_file(file):
+    try:
+        posisi = file.tell()
+        file.seek(0, 2)
+        ukuran = file.tell()
+        file.seek(posisi)
+        return ukuran
+    except Exception:
+        return None
+
+def process_file(file, chunksize=UKURAN_CHUNK):
+    with span("process_file", bytes=_ukuran_file(file)) as s:
+        res = _process_file(file, chunksize)
+        s['baris'] = len(res)
+    return res
+
+def _process_file(file, chunksize):
+    pairer = ShiftPairer()
+    hasil = []
+    chunks = read_taps(file, chunksize)
+    try:
+        for taps in chunks:
+            hasil.append(pairer.feed(taps))
+        hasil.append(pairer.finish())
+    except _TapTidakUrut:
+        chunks.close()
+        # File tidak urut waktu: baca ulang (tetap 2 kolom) lalu pairing sekaligus
+        file.seek(0)
+        hasil = [pair_shifts(pd.concat(read_taps(file), ignore_index=True))]
+
+    hasil = [h for h in hasil if not h.empty]
+    if not hasil:
+        return pd.DataFrame(columns=KOLOM_DATA)
+    res = pd.concat(hasil, ignore_index=True)
+    return res.sort_values(['Nama', 'Tanggal'], kind='mergesort').reset_index(drop=True)
+
+def _taps_kosong():
+    taps = pd.DataFrame({k: pd.Series(dtype='datetime64[ns]' if k == 'Timestamp' else object) for k in KOLOM_TAP})
+    return taps.assign(Ke=pd.Series(dtype='int64'))
+
+def iter_taps(sumber, chunksize=UKURAN_CHUNK):
+    """Path atau isi (bytes) export mesin -> tap per chunk (KOLOM_TAP + Ke).
+
+    Ke menomori baris kembar persis (ID, Timestamp, Mch) di seluruh file, sehingga tap kembar ikut
+    dipairing seperti di process_file, sedangkan file yang bertumpuk tetap terdedup per tap.
+    Kemunculan dari chunk sebelumnya diingat sebagai hash kunci, bukan dengan menahan chunk lama.
+    """
+    hitung = pd.Series(dtype='int64', index=pd.Index([], dtype='uint64'))
+    with (io.BytesIO(sumber) if isinstance(sumber, bytes) else open(sumber, 'rb')) as file:
+        for taps in read_taps(file, chunksize, kunci=True):
+            h = pd.util.hash_pandas_object(taps[['ID', 'Timestamp', 'Mch']], index=False).to_numpy()
+            taps['Ke'] = taps.groupby(h, sort=False).cumcount().to_numpy() + hitung.reindex(h, fill_value=0).to_numpy()
+            hitung = hitung.add(pd.Series(h).value_counts(), fill_value=0).astype('int64')
+            yield taps
+
+def parse_taps(sumber):
+    """Worker ingest (process pool): semua tap satu export mesin dalam satu frame."""
+    chunks = list(iter_taps(sumber))
+    if not chunks:
+        return _taps_kosong()
+    return pd.concat(chunks, ignore_index=True)
+
+def parse_files(sumber, max_workers=None, progres=None, saring=None):
+    """Parse beberapa export mesin sekaligus.
+
+    `sumber` berisi pasangan (nama, path | bytes). File di-parse paralel di process pool lalu
+    tap semua mesin digabung (shift malam bisa masuk di satu mesin dan pulang di mesin lain).
+    `saring(nama, taps)` (opsional) dipanggil per potongan tap dan hanya hasilnya yang ditahan:
+    satu file dibaca streaming per chunk, di process pool per file. Tap file yang gagal dibuang.
+    `progres(nama, hasil)` dipanggil tiap file selesai.
+    Return (list (nama, jumlah tap | Exception), DataFrame tap gabungan setelah saring).
+    """
+    per_file, taps = [], []
+
+    def _selesai(nama, potongan):
+        try:
+            jumlah, tahan = 0, []
+            for df in potongan():
+                jumlah += len(df)
+                tahan.append(df if saring is None else saring(nama, df))
+            taps.extend(tahan)
+            hasil = jumlah
+        except Exception as e:
+            hasil = e
+        per_file.append((nama, hasil))
+        if progres is not None:
+            progres(nama, hasil)
+
+    with span("parse_files", baris=len(sumber)) as s:
+        if len(sumber) == 1:
+            # Satu file: tidak sebanding dengan biaya menyalakan worker
+            nama, isi = sumber[0]
+            _selesai(nama, lambda: iter_taps(isi))
+        elif sumber:
+            # spawn: worker tidak mewarisi thread/lock milik server Streamlit
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx) as ex:
+                futures = {ex.submit(parse_taps, isi): nama for nama, isi in sumber}
+                for fut in as_completed(futures):
+                    _selesai(futures[fut], lambda: [fut.result()])
+        s['bytes'] = sum(len(isi) for _, isi in sumber if isinstance(isi, bytes)) or None
+
+    taps = [t for t in taps if not t.empty]
+    if not taps:
+        return per_file, _taps_kosong()
+    return per_file, pd.concat(taps, ignore_index=True)
+
+# --- INGEST INKREMENTAL ---
+def sidik_file(isi):
+    """sha256 isi export mesin (path atau bytes), kunci registri file yang sudah di-ingest."""
+    h = hashlib.sha256()
+    if isinstance(isi, bytes):
+        h.update(isi)
+    else:
+        with open(isi, 'rb') as f:
+            for blok in iter(lambda: f.read(1 << 20), b''):
+                h.update(blok)
+    return h.hexdigest()
+
+def _gabung_jendela(jendela):
+    """Gabung rentang (Nama, dari, sampai) yang bertumpuk atau bersambung milik pegawai yang sama."""
+    jendela = jendela.sort_values(['Nama', 'dari'], kind='mergesort')
+    akhir_sebelum = jendela['sampai'].groupby(jendela['Nama']).cummax().shift()
+    # Jendela baru bila pegawai berganti atau ada hari kosong di antara dua rentang
+    pisah = (jendela['Nama'] != jendela['Nama'].shift()) | (jendela['dari'] > akhir_sebelum + pd.Timedelta(days=1))
+    return jendela.groupby(pisah.cumsum().to_numpy()) \
+        .agg({'Nama': 'first', 'dari': 'min', 'sampai': 'max'}).reset_index(drop=True)
+
+def _jendela(hari):
+    """Rentang [D-1, D+1] di sekitar tiap (Nama, D) di `hari`, digabung per pegawai bila bersambung.
+
+    Tap baru di hari D bisa mengubah D-1 (shift malam kemarin meminjam tap pagi D), D sendiri,
+    dan D+1 (tap pagi D+1 dipinjam D). Return frame (Nama, dari, sampai).
+    """
+    satu = pd.Timedelta(days=1)
+    return _gabung_jendela(pd.DataFrame({
+        'Nama': hari['Nama'].to_numpy(),
+        'dari': (hari['Tanggal'] - satu).to_numpy(),
+        'sampai': (hari['Tanggal'] + satu).to_numpy(),
+    }))
+
+def _dalam_jendela(hari, jendela):
+    """Mask baris `hari` (Nama, Tanggal) yang jatuh di salah satu rentang `jendela`."""
+    kiri = pd.DataFrame({'Nama': hari['Nama'].to_numpy(), 'Tanggal': hari['Tanggal'].to_numpy(), 'posisi': np.arange(len(hari))})
+    # Rentang per pegawai tidak bertumpuk: cukup cocokkan dengan rentang terakhir yang dimulai <= Tanggal
+    cocok = pd.merge_asof(kiri.sort_values('Tanggal'), jendela.sort_values('dari'),
+                          left_on='Tanggal', right_on='dari', by='Nama')
+    mask = np.zeros(len(hari), dtype=bool)
+    mask[cocok.loc[cocok['Tanggal'] <= cocok['sampai'], 'posisi'].to_numpy()] = True
+    return mask
+
+def pair_inkremental(storage, taps):
+    """Pairing ulang jendela pegawai yang menerima tap baru, tanpa memproses ulang histori.
+
+    Tap tersimpan diambil per jendela (lihat _jendela); status "dipinjam" hari pertama tiap
+    jendela dibaca dari baris tersimpan hari sebelumnya (STATUS_MALAM = tap paginya terpakai).
+    Bila status pinjam hari terakhir jendela berubah, rantai shift malam berlanjut ke hari
+    berikutnya sehingga jendela diperpanjang sampai stabil.
+    Return (baris semua hari bertap di jendela, kunci (Nama, Tanggal) tersimpan yang kini kosong).
+    """
+    taps = taps[['Nama', 'Timestamp']].dropna()
+    if taps.empty:
+        return pd.DataFrame(columns=KOLOM_DATA), pd.DataFrame(columns=['Nama', 'Tanggal'])
+    satu = pd.Timedelta(days=1)
+    jendela = _jendela(pd.DataFrame({'Nama': taps['Nama'], 'Tanggal': taps['Timestamp'].dt.normalize()}).drop_duplicates())
+
+    while True:
+        # Tap hari sesudah jendela hanya konteks (bisa dipinjam hari terakhir); barisnya tidak dipakai
+        konteks = storage.ambil_tap(jendela.assign(sampai=jendela['sampai'] + satu))
+        lama = storage.query_attendance(jendela['dari'].min() - satu, jendela['sampai'].max(),
+                                        jendela['Nama'].unique().tolist())
+        lama = pd.DataFrame({'Nama': lama['Nama'].astype(object), 'Tanggal': lama['Tanggal'],
+                             'malam': (lama['Status_Data'] == STATUS_MALAM).to_numpy()})
+        malam = set(zip(lama.loc[lama['malam'], 'Nama'], lama.loc[lama['malam'], 'Tanggal']))
+        dipinjam_awal = {(n, d) for n, d in zip(jendela['Nama'], jendela['dari']) if (n, d - satu) in malam}
+        hari = _pair_days(pd.concat([konteks, taps], ignore_index=True), dipinjam_awal)
+        hari = hari[_dalam_jendela(hari, jendela)]
+
+        # Hari terakhir jendela (yang punya tap) dengan status pinjam berbeda dari yang tersimpan
+        akhir = hari.merge(jendela.rename(columns={'sampai': 'Tanggal'}), on=['Nama', 'Tanggal']) \
+            .merge(lama, how='left', on=['Nama', 'Tanggal'])
+        beda = akhir['pinjam'].astype(bool) != akhir['malam'].fillna(False).astype(bool)
+        lanjut = set(zip(akhir.loc[beda, 'Nama'], akhir.loc[beda, 'Tanggal']))
+        if not lanjut:
+            break
+        perpanjang = [kunci in lanjut for kunci in zip(jendela['Nama'], jendela['sampai'])]
+        jendela.loc[perpanjang, 'sampai'] += PERPANJANG_JENDELA
+        jendela = _gabung_jendela(jendela)
+
+    kosong = hari.loc[hari['kosong'].astype(bool), ['Nama', 'Tanggal']]
+    hapus = kosong.merge(lama[['Nama', 'Tanggal']], on=['Nama', 'Tanggal'])
+    baris = _format_hasil(hari).sort_values(['Nama', 'Tanggal'], kind='mergesort').reset_index(drop=True)
+    return baris, hapus
+
+def siapkan_ingest(storage, sumber, max_workers=None, progres=None, pegawai=None):
+    """Tahap baca ingest idempoten (belum menulis apa pun).
+
+    File yang isinya (sha256) sudah pernah di-ingest ditolak tanpa di-parse; dari file sisanya
+    hanya tap dengan kunci (ID, Timestamp, Mch) baru yang dipairing. Tap atas nama di luar master
+    `pegawai` (DaftarPegawai; default dimuat dari storage) ditolak, sisanya memakai ejaan master.
+    Return dict: per_file [(nama, jumlah tap | Exception)], duplikat [nama], ditolak {nama: jumlah tap},
+    taps (tap baru), files, baris, hapus (kunci tersimpan yang tidak lagi menghasilkan baris).
+    """
+    with span("siapkan_ingest", baris=len(sumber)) as s:
+        proses, duplikat, sha_proses = [], [], []
+        sidik = [sidik_file(isi) for _, isi in sumber]
+        dikenal = storage.file_dikenal(set(sidik))
+        for (nama, isi), sha in zip(sumber, sidik):
+            if sha in dikenal or sha in sha_proses:
+                duplikat.append(nama)
+            else:
+                proses.append((nama, isi))
+                sha_proses.append(sha)
+
+        if pegawai is None:
+            pegawai = MasterPegawai(storage).get()
+        tolak_file = {}
+
+        def saring(i, taps):
+            # Per chunk: hanya tap sah yang belum tersimpan yang ditahan di memori
+            nama = pegawai.kanonik(taps['Nama'])
+            sah = nama.notna().to_numpy()
+            tolak_file.setdefault(i, Counter()).update(taps.loc[~sah, 'Nama'].value_counts().to_dict())
+            taps = taps[sah].assign(Nama=nama[sah]).drop_duplicates(KUNCI_TAP, ignore_index=True)
+            return taps[storage.tap_baru(taps)]
+
+        # Nama file bisa sama (mesin berbeda): worker dikenali lewat posisi
+        lapor = None if progres is None else (lambda i, hasil: progres(proses[i][0], hasil))
+        per_file, taps = parse_files([(i, isi) for i, (_, isi) in enumerate(proses)], max_workers, lapor, saring)
+        berhasil = [i for i, hasil in per_file if not isinstance(hasil, Exception)]
+        files = [(sha_proses[i], proses[i][0], hasil) for i, hasil in per_file if not isinstance(hasil, Exception)]
+        per_file = [(proses[i][0], hasil) for i, hasil in per_file]
+
+        ditolak = dict(sum((tolak_file.get(i, Counter()) for i in berhasil), Counter()))
+        if ditolak:
+            # File belum dicatat supaya bisa diupload ulang setelah master dilengkapi
+            # (tap yang sudah diterima tetap dilewati lewat kunci tap)
+            files = []
+
+        # File bertumpuk dalam satu batch: tap yang sama bisa lolos saring dari dua file
+        taps = taps.drop_duplicates(KUNCI_TAP, ignore_index=True)
+        baris, hapus = pair_inkremental(storage, taps)
+        s['baris'] = len(baris)
+    return {'per_file': per_file, 'duplikat': duplikat, 'ditolak': ditolak, 'taps': taps, 'files': files,
+            'baris': baris, 'hapus': hapus}
+
+def simpan_ingest(storage, hasil, pdf_cache=None):
+    """Simpan baris hasil siapkan_ingest, hapus baris yang kini kosong, lalu catat tap & file ke registri.
+
+    Registri juga dicatat bila hanya mirror yang gagal (baris sudah ada di lokal), supaya
+    upload ulang file yang sama tetap ditolak.
+    """
+    galat, berubah = None, None
+    try:
+        berubah = simpan_data(storage, hasil['baris'], pdf_cache)
+    except MirrorGagal as e:
+        galat = e
+    if not hasil['hapus'].empty:
+        try:
+            storage.hapus_data(hasil['hapus'])
+        except MirrorGagal as e:
+            galat = galat or e
+        finally:
+            _buang_pdf(pdf_cache, hasil['hapus'])
+    storage.catat_ingest(hasil['taps'], hasil['files'])
+    if galat is not None:
+        raise galat
+    return berubah
+
+# --- SIMPAN & LAPORAN ---
+def simpan_data(storage, df, pdf_cache=None):
+    """Simpan baris hasil proses; cache PDF bulan yang tersentuh ikut dibuang (juga saat mirror gagal)."""
+    try:
+        with span("save_data", baris=len(df)):
+            return storage.save_data(df)
+    finally:
+        _buang_pdf(pdf_cache, df)
+
+def _buang_pdf(pdf_cache, df):
+    if pdf_cache is not None and not df.empty:
+        tgl = pd.to_datetime(df['Tanggal']).dropna()
+        for year, month in set(zip(tgl.dt.year, tgl.dt.month)):
+            pdf_cache.hapus_bulan(year, month)
+
+def rentang_bulan(year, month):
+    """(tanggal pertama, tanggal terakhir) satu bulan, untuk query_attendance."""
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+def ringkasan_dashboard(rekap):
+    """Angka kartu Dashboard dari tabel rekap bulanan (bukan dari data mentah)."""
+    status = rekap['Status_Data'].astype(str)
+    return {
+        'pegawai': rekap['Nama'].nunique(),
+        'lengkap': int(rekap['Jumlah'][status.str.contains('Lengkap', regex=False)].sum()),
+        'tidak_lengkap': int(rekap['Jumlah'][status.str.contains('Tidak', regex=False)].sum()),
+    }
+
+def kategori_status(status):
+    """Kategori grafik Analisis Pegawai untuk satu nilai Status_Data."""
+    if 'Lengkap' in status:
+        return 'Lengkap'
+    return 'Tidak Absen Pagi' if 'Pagi' in status else 'Tidak Absen Pulang'
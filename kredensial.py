@@ -0,0 +1,147 @@
+"""Penyimpanan kredensial login: hash password ber-salt dan lookup per Username.
+
+Password disimpan sebagai "pbkdf2_sha256$iterasi$salt$hash". Nilai lama berupa teks polos
+di sheet Users tetap diterima dan di-hash saat disalin ke backend lokal (set_users).
+Buat hash untuk diisikan langsung ke sheet:  python kredensial.py hash
+"""
+import getpass
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import deque
+
+SKEMA_HASH = "pbkdf2_sha256"
+ITERASI = 200_000
+TTL_REFRESH = 300    # detik antar refresh daftar user di latar
+MAKS_GAGAL = 5       # percobaan gagal per username dalam JENDELA_GAGAL...
+JENDELA_GAGAL = 300
+LAMA_KUNCI = 60      # ...mengunci username itu sekian detik
+
+
+class TerlaluBanyakPercobaan(Exception):
+    def __init__(self, sisa):
+        super().__init__(f"Coba lagi dalam {sisa} detik")
+        self.sisa = sisa
+
+
+# --- HASH PASSWORD ---
+def hash_password(password, salt=None, iterasi=ITERASI):
+    salt = salt or os.urandom(16)
+    dk = hashlib.pbkdf2_hmac('sha256', str(password).encode(), salt, iterasi)
+    return f"{SKEMA_HASH}${iterasi}${salt.hex()}${dk.hex()}"
+
+
+def sudah_hash(nilai):
+    return isinstance(nilai, str) and nilai.startswith(SKEMA_HASH + "$")
+
+
+def cek_password(password, tersimpan):
+    if not sudah_hash(tersimpan):
+        return False
+    _, iterasi, salt, _ = tersimpan.split("$")
+    return hmac.compare_digest(hash_password(password, bytes.fromhex(salt), int(iterasi)), tersimpan)
+
+
+def amankan_password(password, hash_lama=None):
+    """Nilai kolom Password untuk disimpan: hash apa adanya, teks polos di-hash.
+
+    Bila teks polos masih cocok dengan `hash_lama`, hash lama dipakai ulang supaya
+    tarikan ulang sheet yang sama tidak mengubah isi tabel users.
+    """
+    if password is None or password != password:  # None / NaN: user tanpa password, tidak bisa login
+        return None
+    if sudah_hash(password):
+        return password
+    if hash_lama and cek_password(password, hash_lama):
+        return hash_lama
+    return hash_password(password)
+
+
+# --- STORE ---
+class KredensialStore:
+    """Dict Username -> (hash, role, nama) di memori, di-refresh di latar tiap `ttl` detik.
+
+    Login tidak menyentuh backend sama sekali; percobaan gagal dibatasi per username.
+    """
+
+    def __init__(self, storage, ttl=TTL_REFRESH):
+        self.storage = storage
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._users = None
+        self._gagal = {}  # username -> deque waktu gagal
+        self._kunci = {}  # username -> terkunci sampai
+        self._dummy = hash_password("")
+
+    def _muat(self):
+        df = self.storage.get_users()
+        users = {}
+        for row in df.itertuples(index=False):
+            if row.Username == row.Username:  # lewati NaN
+                users[str(row.Username).strip()] = (row.Password, row.Role, row.Nama_Lengkap)
+        self._users = users  # ganti referensi sekaligus; pembaca tidak perlu lock
+
+    def refresh(self):
+        try:
+            # Cek revisi remote dulu: edit langsung di sheet Users ikut tertarik, tanpa unduhan bila tidak berubah
+            self.storage.pull()
+        except Exception:
+            pass  # remote tidak terjangkau: tetap baca tabel users lokal
+        try:
+            self._muat()
+        except Exception:
+            pass  # pertahankan daftar lama bila backend sedang tidak terjangkau
+
+    def start(self):
+        def _loop():
+            while True:
+                time.sleep(self.ttl)
+                self.refresh()
+        threading.Thread(target=_loop, daemon=True).start()
+        return self
+
+    def users(self):
+        if self._users is None:
+            self._muat()
+        return self._users
+
+    def _cek_kunci(self, username, now):
+        with self.lock:
+            sampai = self._kunci.get(username, 0)
+        if sampai > now:
+            raise TerlaluBanyakPercobaan(int(sampai - now) + 1)
+
+    def _catat_gagal(self, username, now):
+        with self.lock:
+            gagal = self._gagal.setdefault(username, deque())
+            gagal.append(now)
+            while gagal and gagal[0] < now - JENDELA_GAGAL:
+                gagal.popleft()
+            if len(gagal) >= MAKS_GAGAL:
+                self._kunci[username] = now + LAMA_KUNCI
+                gagal.clear()
+
+    def verifikasi(self, username, password):
+        """Return (role, nama_lengkap) bila cocok, None bila salah; TerlaluBanyakPercobaan bila terkunci."""
+        username = str(username).strip()
+        now = time.monotonic()
+        self._cek_kunci(username, now)
+        entri = self.users().get(username)
+        # Username tak dikenal tetap menghitung hash supaya waktu respons tidak membocorkan keberadaannya
+        cocok = cek_password(password, entri[0] if entri else self._dummy) and entri is not None
+        if not cocok:
+            self._catat_gagal(username, now)
+            return None
+        with self.lock:
+            self._gagal.pop(username, None)
+        return entri[1], entri[2]
+
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] != ["hash"]:
+        print("Pemakaian: python kredensial.py hash")
+        sys.exit(1)
+    print(hash_password(getpass.getpass("Password: ")))
@@ -0,0 +1,259 @@
+"""Laporan PDF rekap absensi bulanan.
+
+Dipisah dari app.py supaya bisa di-import oleh worker process pool (ekspor massal)
+tanpa menjalankan script Streamlit.
+"""
+import calendar
+import multiprocessing
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+
+from metrik import span
+from storage import ke_teks
+
+VERSI_LAYOUT_PDF = 2  # naikkan bila tampilan PDF berubah, supaya cache lama tidak dipakai
+WARNA_SEL = {
+    0: (240, 240, 240),  # hari libur / kosong
+    1: (144, 238, 144),  # lengkap (shift normal)
+    2: (173, 216, 230),  # lengkap (shift malam)
+    3: (255, 255, 153),  # tidak lengkap
+    4: (255, 153, 153),  # alpa
+}
+
+TINGGI_HEADER = 12   # mm, baris judul kolom tabel
+TINGGI_BARIS = 10    # mm, satu baris pegawai
+TINGGI_TEKS = 3      # mm, jarak baris teks jam dalam sel hari
+
+class PDF(FPDF):
+    def header(self):
+        self.set_font('Arial', 'B', 10)
+        self.cell(0, 10, 'LAPORAN REKAPITULASI ABSENSI OUTSOURCING', 0, 1, 'C')
+        self.cell(0, 10, 'BP3MI JAWA TENGAH', 0, 1, 'C')
+
+def _grid_bulan(df_source, year, month):
+    """Pivot data satu bulan sekali jadi grid (pegawai x hari): kode warna, teks sel, rekap H/A/TL."""
+    num_days = calendar.monthrange(year, month)[1]
+    hari_kerja = np.array([calendar.weekday(year, month, d) < 5 for d in range(1, num_days+1)])
+    pegawai = sorted(df_source['Nama'].unique())
+
+    tgl = pd.to_datetime(df_source['Tanggal'])
+    df = df_source[((tgl.dt.year == year) & (tgl.dt.month == month)).to_numpy()]
+    df = df.assign(hari=tgl.dt.day).drop_duplicates(subset=['Nama', 'hari'])  # sama seperti row.iloc[0]
+    m = df['Jam_Masuk'].replace(["None", "nan"], "-")
+    p = df['Jam_Pulang'].replace(["None", "nan"], "-")
+    lengkap = df['Status_Data'].str.contains("Lengkap", regex=False).to_numpy()
+    malam = lengkap & df['Status_Data'].str.contains("Malam", regex=False).to_numpy()
+
+    kode = np.zeros((len(pegawai), num_days), dtype=np.int8)
+    teks = np.full((len(pegawai), num_days), "", dtype=object)
+    baris = pd.Index(pegawai).get_indexer(df['Nama'])
+    kolom = df['hari'].to_numpy() - 1
+    kode[baris, kolom] = np.select([malam, lengkap], [2, 1], 3)
+    teks[baris, kolom] = np.where(lengkap, (m + "\n" + p).to_numpy(), np.where(m != "-", m, p))
+
+    alpa = (kode == 0) & hari_kerja
+    kode[alpa] = 4
+    teks[alpa] = "X"
+    rekap = {
+        'h': np.isin(kode, (1, 2)).sum(axis=1),
+        'a': (kode == 4).sum(axis=1),
+        'tl': (kode == 3).sum(axis=1),
+    }
+    return pegawai, hari_kerja, kode, teks, rekap
+
+class _TataTabel:
+    """Geometri tabel rekap (posisi x tiap kolom) yang dihitung sekali per laporan.
+
+    Sel hari digambar sebagai rect per warna (satu set_fill_color per warna per halaman) dan
+    teks jamnya dengan text() di posisi tetap (satu set_font), bukan cell + multi_cell per sel.
+    """
+    def __init__(self, pdf, num_days):
+        self.pdf = pdf
+        self.col_no, self.col_nama, self.col_summary = 8, 35, 15
+        self.col_day = (pdf.w - self.col_no - self.col_nama - (self.col_summary*3) - 20) / num_days
+        self.x0 = pdf.l_margin
+        awal_hari = self.x0 + self.col_no + self.col_nama
+        self.x_hari = (awal_hari + self.col_day * np.arange(num_days)).tolist()
+        self.x_rekap = awal_hari + self.col_day * num_days
+        self.lebar_teks = {}  # teks sel -> lebar pada font 3pt (jam sangat berulang)
+
+    def header(self, hari_kerja):
+        pdf = self.pdf
+        pdf.set_font("Arial", 'B', 6)
+        pdf.cell(self.col_no, TINGGI_HEADER, 'No', 1, 0, 'C')
+        pdf.cell(self.col_nama, TINGGI_HEADER, 'Nama Pegawai', 1, 0, 'C')
+        for d, kerja in enumerate(hari_kerja, 1):
+            pdf.set_fill_color(255,255,255) if kerja else pdf.set_fill_color(220,220,220)
+            pdf.cell(self.col_day, TINGGI_HEADER, str(d), 1, 0, 'C', fill=True)
+        pdf.cell(self.col_summary, TINGGI_HEADER, 'HADIR', 1, 0, 'C')
+        pdf.cell(self.col_summary, TINGGI_HEADER, 'ALPA', 1, 0, 'C')
+        pdf.cell(self.col_summary, TINGGI_HEADER, 'TIDAK LKP', 1, 1, 'C')
+
+    def blok(self, baris, pegawai, kode, teks, rekap):
+        """Gambar baris pegawai `baris` (range) mulai posisi y saat ini, lalu geser y ke bawah blok."""
+        pdf = self.pdf
+        y0 = pdf.get_y()
+        ys = [y0 + TINGGI_BARIS * i for i in range(len(baris))]
+
+        pdf.set_font("Arial", '', 6)
+        for idx, y in zip(baris, ys):
+            pdf.set_xy(self.x0, y)
+            pdf.cell(self.col_no, TINGGI_BARIS, str(idx + 1), 1, 0, 'C')
+            pdf.cell(self.col_nama, TINGGI_BARIS, str(pegawai[idx])[:18], 1, 0, 'L')
+            pdf.set_x(self.x_rekap)
+            pdf.cell(self.col_summary, TINGGI_BARIS, str(rekap['h'][idx]), 1, 0, 'C')
+            pdf.cell(self.col_summary, TINGGI_BARIS, str(rekap['a'][idx]), 1, 0, 'C')
+            pdf.cell(self.col_summary, TINGGI_BARIS, str(rekap['tl'][idx]), 1, 0, 'C')
+
+        kode_blok = kode[baris.start:baris.stop]
+        for k, warna in WARNA_SEL.items():
+            posisi = np.argwhere(kode_blok == k).tolist()
+            if not posisi:
+                continue
+            pdf.set_fill_color(*warna)
+            for i, d in posisi:
+                pdf.rect(self.x_hari[d], ys[i], self.col_day, TINGGI_BARIS, 'DF')
+
+        # Teks jam: baris ke-j di baseline yang sama dengan multi_cell(h=3) yang dimulai 1 mm di bawah tepi sel
+        pdf.set_font("Arial", '', 3)
+        turun = 1 + .5 * TINGGI_TEKS + .3 * pdf.font_size
+        teks_blok = teks[baris.start:baris.stop]
+        for i, d in np.argwhere(teks_blok != "").tolist():
+            for j, potong in enumerate(teks_blok[i, d].split("\n")):
+                lebar = self.lebar_teks.get(potong)
+                if lebar is None:
+                    lebar = self.lebar_teks[potong] = pdf.get_string_width(potong)
+                pdf.text(self.x_hari[d] + (self.col_day - lebar) / 2, ys[i] + turun + TINGGI_TEKS * j, potong)
+
+        pdf.set_xy(self.x0, y0 + TINGGI_BARIS * len(baris))
+
+def generate_pdf(df_source, year, month):
+    with span("generate_pdf", baris=len(df_source)) as s:
+        data = _render_pdf(df_source, year, month)
+        s['bytes'] = len(data)
+    return data
+
+def _render_pdf(df_source, year, month):
+    df_source = ke_teks(df_source)  # teks sel PDF butuh jam 'HH:MM:SS'
+    df_source['Nama'] = df_source['Nama'].fillna("Tanpa Nama")
+    df_source['Jam_Masuk'] = df_source['Jam_Masuk'].fillna("-").astype(str)
+    df_source['Jam_Pulang'] = df_source['Jam_Pulang'].fillna("-").astype(str)
+    df_source['Status_Data'] = df_source['Status_Data'].fillna("Tidak Lengkap").astype(str)
+    pegawai, hari_kerja, kode, teks, rekap = _grid_bulan(df_source, year, month)
+
+    pdf = PDF(orientation='L', unit='mm', format='A4')
+    pdf.add_page()
+    num_days = calendar.monthrange(year, month)[1]
+    tata = _TataTabel(pdf, num_days)
+
+    nama_bulan = calendar.month_name[month].upper()
+    pdf.set_font("Arial", 'B', 9)
+    pdf.cell(0, 5, f"PERIODE : {nama_bulan} {year}", 0, 1, 'L')
+    pdf.ln(2)
+
+    # Baris pegawai digambar per halaman; header tabel diulang di tiap halaman baru
+    tata.header(hari_kerja)
+    mulai = 0
+    while mulai < len(pegawai):
+        muat = max(1, int((pdf.page_break_trigger - pdf.get_y()) // TINGGI_BARIS))
+        blok = range(mulai, min(len(pegawai), mulai + muat))
+        tata.blok(blok, pegawai, kode, teks, rekap)
+        mulai = blok.stop
+        if mulai < len(pegawai):
+            pdf.add_page()
+            tata.header(hari_kerja)
+
+    # LEGENDA
+    pdf.ln(8)
+    pdf.set_font("Arial", 'B', 7)
+    pdf.cell(0, 5, "KETERANGAN WARNA (LEGENDA):", 0, 1, 'L')
+    
+    def draw_legend(r, g, b, text):
+        pdf.set_fill_color(r, g, b)
+        pdf.cell(4, 4, "", 1, 0, 'C', fill=True)
+        pdf.cell(2)
+        pdf.cell(30, 4, text, 0, 0, 'L')
+        pdf.cell(5)
+
+    pdf.set_font("Arial", '', 7)
+    draw_legend(144, 238, 144, "Lengkap (Shift Normal)")
+    draw_legend(173, 216, 230, "Lengkap (Shift Malam)")
+    draw_legend(255, 255, 153, "Data Tidak Lengkap")
+    draw_legend(255, 153, 153, "Tidak Hadir (Alpa)")
+    draw_legend(240, 240, 240, "Hari Libur / Kosong")
+    
+    return pdf.output(dest='S').encode('latin-1')
+
+
+# --- EKSPOR MASSAL ---
+def buat_jobs(df, periode, per_pegawai=False):
+    """Pecah data jadi job render: satu PDF per bulan, atau satu PDF per pegawai per bulan."""
+    tgl = pd.to_datetime(df['Tanggal'])
+    jobs = []
+    for year, month in periode:
+        bulan = df[((tgl.dt.year == year) & (tgl.dt.month == month)).to_numpy()]
+        if bulan.empty:
+            continue
+        if per_pegawai:
+            for nama, grup in bulan.groupby('Nama', observed=True):
+                nama_file = str(nama).replace('/', '-').replace('\\', '-')
+                jobs.append((f"{year}-{month:02d}/{nama_file}.pdf", grup, year, month))
+        else:
+            jobs.append((f"Laporan Absensi Outsourcing {year}-{month:02d}.pdf", bulan, year, month))
+    return jobs
+
+def render_job(job):
+    nama_file, df, year, month = job
+    return nama_file, generate_pdf(df, year, month)
+
+class BatchExport:
+    """Render banyak laporan paralel di process pool dan tulis hasilnya ke satu ZIP sementara.
+
+    Berjalan di thread latar; UI cukup membaca `selesai`/`total`/`done`/`error` untuk progres.
+    """
+    def __init__(self, jobs, max_workers=None):
+        self.jobs = jobs
+        self.total = len(jobs)
+        self.selesai = 0
+        self.max_workers = max_workers
+        self.zip_path = None
+        self.error = None
+        self.done = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        fd, path = tempfile.mkstemp(prefix="laporan_", suffix=".zip")
+        try:
+            # spawn: worker tidak mewarisi thread/lock milik server Streamlit
+            ctx = multiprocessing.get_context("spawn")
+            with span("ekspor_batch", baris=self.total) as s, \
+                    ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx) as ex, \
+                    zipfile.ZipFile(os.fdopen(fd, 'wb'), 'w', zipfile.ZIP_DEFLATED) as zf:
+                futures = [ex.submit(render_job, job) for job in self.jobs]
+                self.jobs = None  # data sudah dikirim ke worker
+                for fut in as_completed(futures):
+                    nama_file, data = fut.result()
+                    zf.writestr(nama_file, data)
+                    self.selesai += 1
+                    s['bytes'] = (s['bytes'] or 0) + len(data)
+            self.zip_path = path
+        except Exception as e:
+            self.error = e
+            os.remove(path)
+        finally:
+            self.done = True
+
+    def cleanup(self):
+        if self.zip_path and os.path.exists(self.zip_path):
+            os.remove(self.zip_path)
@@ -0,0 +1,88 @@
+"""Pengukuran waktu jalur panas: baca/tulis storage, proses file, simpan, render PDF.
+
+Setiap span (operasi, durasi, baris, bytes) masuk ring buffer di memori proses ini.
+Bila env ABSENSI_METRIK berisi path file, span juga di-append ke file itu (JSONL)
+untuk dianalisis di luar aplikasi. Tidak bergantung pada Streamlit.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+KAPASITAS = 5000
+FILE_EKSPOR = os.environ.get("ABSENSI_METRIK")
+
+_buffer = deque(maxlen=KAPASITAS)
+_kunci_file = threading.Lock()
+
+
+@contextmanager
+def span(operasi, **info):
+    """Ukur durasi blok. Isi `baris`/`bytes` lewat dict yang di-yield bila baru diketahui di dalam blok."""
+    catatan = {'baris': None, 'bytes': None, **info}
+    t0 = time.perf_counter()
+    gagal = False
+    try:
+        yield catatan
+    except BaseException:
+        gagal = True
+        raise
+    finally:
+        catatan.update(operasi=operasi, waktu=time.time(), detik=time.perf_counter() - t0, gagal=gagal)
+        _simpan(catatan)
+
+
+def catat(operasi, detik, **info):
+    """Catat durasi yang diukur sendiri, untuk blok yang tidak bisa dibungkus `span` (mis. berakhir di st.stop)."""
+    _simpan({'baris': None, 'bytes': None, **info, 'operasi': operasi, 'waktu': time.time(), 'detik': detik, 'gagal': False})
+
+
+def _simpan(catatan):
+    _buffer.append(catatan)
+    if FILE_EKSPOR:
+        _tulis_file(catatan)
+
+
+def _tulis_file(catatan):
+    try:
+        with _kunci_file, open(FILE_EKSPOR, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(catatan, default=str) + "\n")
+    except OSError:
+        pass  # metrik tidak boleh mengganggu jalur utama
+
+
+def ukuran_df(df):
+    """Perkiraan bytes isi DataFrame (untuk transfer remote; jangan dipakai di jalur lokal yang murah)."""
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def semua():
+    return pd.DataFrame(list(_buffer), columns=['waktu', 'operasi', 'detik', 'baris', 'bytes', 'gagal'])
+
+
+def ringkasan():
+    """p50/p95/maks per operasi, urut dari total waktu terbesar."""
+    df = semua()
+    if df.empty:
+        return pd.DataFrame(columns=['operasi', 'jumlah', 'p50_ms', 'p95_ms', 'maks_ms', 'total_s', 'baris', 'bytes', 'gagal'])
+    df['ms'] = df['detik'] * 1000
+    grup = df.groupby('operasi')
+    hasil = pd.DataFrame({
+        'jumlah': grup.size(),
+        'p50_ms': grup['ms'].median(),
+        'p95_ms': grup['ms'].quantile(0.95),
+        'maks_ms': grup['ms'].max(),
+        'total_s': grup['detik'].sum(),
+        'baris': grup['baris'].sum(min_count=1),
+        'bytes': grup['bytes'].sum(min_count=1),
+        'gagal': grup['gagal'].sum(),
+    }).round({'p50_ms': 1, 'p95_ms': 1, 'maks_ms': 1, 'total_s': 3})
+    return hasil.sort_values('total_s', ascending=False).reset_index()
+
+
+def reset():
+    _buffer.clear()
@@ -0,0 +1,85 @@
+"""Master pegawai: daftar nama sah di memori, dimuat ulang hanya saat versi Data_Pegawai berubah.
+
+Nama dicocokkan setelah dinormalisasi (spasi dirapikan, huruf kecil), sehingga 'BUDI  santoso '
+dari export mesin cocok dengan 'Budi Santoso' di master dan disimpan memakai ejaan master.
+Master kosong (sheet Data_Pegawai belum diisi) berarti semua nama diterima, tanpa filter.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+def normalisasi(nama):
+    """'  BUDI   Santoso ' -> 'budi santoso'."""
+    return " ".join(str(nama).split()).casefold()
+
+
+class DaftarPegawai:
+    """Satu versi master pegawai; tidak diubah setelah dibuat (aman dibaca bersama antar thread)."""
+
+    def __init__(self, versi, names):
+        self.versi = versi
+        self._kanonik = {}  # nama ternormalisasi -> ejaan master, spasi dirapikan (entri pertama menang)
+        for nama in names:
+            if nama == nama and str(nama).strip():  # lewati NaN / kosong
+                self._kanonik.setdefault(normalisasi(nama), " ".join(str(nama).split()))
+        self.nama = tuple(sorted(set(self._kanonik.values())))
+
+    @property
+    def kosong(self):
+        return not self.nama
+
+    def sah(self, nama):
+        """True bila `nama` (ejaan apa pun) ada di master; master kosong menerima semua."""
+        return self.kosong or normalisasi(nama) in self._kanonik
+
+    def kanonik(self, names):
+        """Series nama -> ejaan master, NaN bila tidak dikenal. Master kosong: dikembalikan apa adanya."""
+        names = pd.Series(names)
+        if self.kosong:
+            return names
+        # Nama sangat berulang (satu per tap): normalisasi nilai unik saja
+        kode, unik = pd.factorize(names)
+        peta = np.array([self._kanonik.get(normalisasi(n), np.nan) for n in unik] + [np.nan], dtype=object)
+        return pd.Series(peta[kode], index=names.index, dtype=object)
+
+    def mask(self, names):
+        """Mask boolean per nama: True bila (ejaan apa pun) ada di master."""
+        kode, unik = pd.factorize(pd.Series(names))
+        ada = np.array([normalisasi(n) in self._kanonik for n in unik] + [False], dtype=bool)
+        return ada[kode]
+
+    def saring(self, df, kolom='Nama'):
+        """Baris `df` milik pegawai master; ejaan tersimpan dicocokkan setelah normalisasi, seperti saat ingest."""
+        if self.kosong or df.empty:
+            return df
+        return df[self.mask(df[kolom])]
+
+
+class MasterPegawai:
+    """Satu DaftarPegawai per proses, ditukar atomik saat storage.versi("Data_Pegawai") berubah.
+
+    Gagal memuat ulang tidak pernah menghasilkan daftar kosong (yang berarti tanpa filter):
+    daftar lama tetap dipakai, atau galat diteruskan bila belum pernah berhasil dimuat.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.lock = threading.Lock()
+        self._daftar = None
+
+    def get(self):
+        versi = self.storage.versi("Data_Pegawai")
+        daftar = self._daftar
+        if daftar is not None and versi is not None and daftar.versi == versi:
+            return daftar
+        with self.lock:
+            if self._daftar is not None and versi is not None and self._daftar.versi == versi:
+                return self._daftar
+            try:
+                self._daftar = DaftarPegawai(versi, self.storage.get_pegawai())
+            except Exception:
+                if self._daftar is None:
+                    raise
+            return self._daftar
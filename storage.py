@@ -0,0 +1,1410 @@
+"""Lapisan penyimpanan Sistem Absensi.
+
+Backend lokal (SQLite, index (Nama, Tanggal)) menjadi sumber baca utama; Google Sheets
+opsional sebagai mirror remote. Modul ini tidak bergantung pada Streamlit sehingga
+bisa dipakai dari script lain.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from kredensial import amankan_password
+from metrik import span, ukuran_df
+from pegawai import MasterPegawai
+
+KOLOM_DATA = ['Nama', 'Tanggal', 'Jam_Masuk', 'Jam_Pulang', 'Status_Data']
+KOLOM_ISI = ['Jam_Masuk', 'Jam_Pulang', 'Status_Data']
+KOLOM_LOG = ['Waktu', 'Aksi', 'Detail']
+KOLOM_LOG_TAMPIL = ['Waktu', 'Aksi', 'Pengguna', 'Detail']  # Pengguna = prefix "[user] " di Detail
+KOLOM_USERS = ['Username', 'Password', 'Role', 'Nama_Lengkap']
+KOLOM_REKAP = ['Nama', 'Bulan', 'Status_Data', 'Jumlah']  # Bulan = 'YYYY-MM'
+KOLOM_TAP = ['ID', 'Timestamp', 'Mch', 'Nama']   # tap mentah export mesin
+# Identitas satu tap antar upload. Ke = urutan kemunculan (ID, Timestamp, Mch) yang sama dalam satu
+# file: baris kembar persis tetap dihitung sebagai tap terpisah, seperti di process_file
+KUNCI_TAP = ['ID', 'Timestamp', 'Mch', 'Ke']
+
+JAM_KOSONG = -1      # sentinel Jam_Masuk/Jam_Pulang kosong ('-') di frame bertipe
+
+LOG_BATCH = 20       # flush log ke mirror setelah sekian entri tertunda...
+LOG_INTERVAL = 60    # ...atau setelah entri tertua berumur sekian detik
+PULL_INTERVAL = 30   # detik antar cek revisi mirror di latar (tarik master hanya bila revisi berubah)
+RETENSI_LOG_BULAN = 3  # bulan sebelum bulan log terbaru yang tetap di tabel log_sistem; lebih lama diarsipkan
+
+SKEMA = """
+CREATE TABLE IF NOT EXISTS data_utama (
+    nama TEXT NOT NULL, tanggal TEXT NOT NULL,
+    jam_masuk TEXT, jam_pulang TEXT, status_data TEXT, digest TEXT,
+    PRIMARY KEY (nama, tanggal)
+);
+CREATE INDEX IF NOT EXISTS idx_data_tanggal ON data_utama (tanggal, nama);
+CREATE TABLE IF NOT EXISTS log_sistem (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, waktu TEXT, aksi TEXT, detail TEXT, pengguna TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_log_waktu ON log_sistem (waktu);
+CREATE TABLE IF NOT EXISTS log_arsip (
+    bulan TEXT PRIMARY KEY, jumlah INTEGER NOT NULL, ringkas TEXT NOT NULL, isi BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY, password TEXT, role TEXT, nama_lengkap TEXT
+);
+CREATE TABLE IF NOT EXISTS pegawai (nama TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS versi (nama TEXT PRIMARY KEY, nilai INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS rekap_bulanan (
+    nama TEXT NOT NULL, bulan TEXT NOT NULL, status_data TEXT NOT NULL, jumlah INTEGER NOT NULL,
+    PRIMARY KEY (nama, bulan, status_data)
+);
+CREATE TABLE IF NOT EXISTS tap_mentah (
+    id TEXT NOT NULL, waktu TEXT NOT NULL, mch TEXT NOT NULL, nama TEXT NOT NULL, ke INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (id, waktu, mch, ke)
+);
+CREATE INDEX IF NOT EXISTS idx_tap_nama ON tap_mentah (nama, waktu);
+CREATE TABLE IF NOT EXISTS file_masuk (
+    sha256 TEXT PRIMARY KEY, nama_file TEXT, waktu TEXT, jumlah_tap INTEGER
+);
+"""
+
+
+class MirrorGagal(Exception):
+    """Data sudah tersimpan di backend lokal, tetapi penulisan ke mirror remote gagal."""
+
+
+# --- FRAME BERTIPE ---
+# Di memori Data_Utama dipegang ringkas: Nama/Status_Data categorical, Tanggal datetime64,
+# Jam_Masuk/Jam_Pulang detik sejak 00:00 (int32, JAM_KOSONG bila tidak ada). Bentuk teks
+# hanya dipakai saat menulis ke backend dan saat menampilkan.
+
+def _detik(jam):
+    """'HH:MM:SS' -> detik sejak 00:00; '-', kosong, atau tak terbaca -> JAM_KOSONG."""
+    if pd.api.types.is_integer_dtype(jam):
+        return jam.to_numpy(dtype='int32')
+    kat = pd.Categorical(jam)  # jam sangat berulang: parse nilai unik saja
+    nilai = pd.to_timedelta(pd.Series(kat.categories.astype(str)), errors='coerce').dt.total_seconds()
+    nilai = nilai.fillna(JAM_KOSONG).to_numpy(dtype='int32')
+    return np.where(kat.codes >= 0, nilai[kat.codes] if len(nilai) else JAM_KOSONG, JAM_KOSONG).astype('int32')
+
+
+def _teks_jam(detik):
+    unik, posisi = np.unique(detik, return_inverse=True)
+    teks = np.array(['-' if d < 0 else f"{d // 3600:02d}:{d // 60 % 60:02d}:{d % 60:02d}" for d in unik.tolist()],
+                    dtype=object)
+    return teks[posisi]
+
+
+def ke_tipe(df):
+    """Frame Data_Utama (teks) -> frame bertipe. Aman dipanggil ulang pada frame yang sudah bertipe."""
+    return pd.DataFrame({
+        'Nama': df['Nama'].astype('category'),
+        'Tanggal': pd.to_datetime(df['Tanggal']),
+        'Jam_Masuk': _detik(df['Jam_Masuk']),
+        'Jam_Pulang': _detik(df['Jam_Pulang']),
+        'Status_Data': df['Status_Data'].astype('category'),
+    }, index=df.index)
+
+
+def ke_teks(df):
+    """Kebalikan ke_tipe untuk kolom isi (jam 'HH:MM:SS'/'-', categorical -> object); Tanggal dibiarkan."""
+    df = df.copy()
+    for kolom in ['Nama', 'Status_Data']:
+        if isinstance(df[kolom].dtype, pd.CategoricalDtype):
+            df[kolom] = df[kolom].astype(object)
+    for kolom in ['Jam_Masuk', 'Jam_Pulang']:
+        if pd.api.types.is_integer_dtype(df[kolom]):
+            df[kolom] = _teks_jam(df[kolom].to_numpy())
+    return df
+
+
+def siapkan_baris(df):
+    """Normalisasi baris ke bentuk yang disimpan: Tanggal 'YYYY-MM-DD', semua string, plus digest isi."""
+    df = ke_teks(df[KOLOM_DATA])
+    df['Tanggal'] = pd.to_datetime(df['Tanggal']).dt.strftime('%Y-%m-%d')
+    df = df.fillna('').astype(str)
+    df['digest'] = pd.util.hash_pandas_object(df[KOLOM_ISI], index=False).astype(str).to_numpy()
+    return df.drop_duplicates(subset=['Nama', 'Tanggal'])
+
+
+def _data_kosong():
+    return pd.DataFrame(columns=KOLOM_DATA)
+
+
+def _data_kosong_tipe():
+    return ke_tipe(_data_kosong())
+
+
+def hitung_rekap(df):
+    """Rekap jumlah hari per (Nama, Bulan, Status_Data) dari data mentah."""
+    if df.empty:
+        return pd.DataFrame(columns=KOLOM_REKAP)
+    bulan = pd.to_datetime(df['Tanggal']).dt.strftime('%Y-%m')
+    rekap = df.assign(Nama=df['Nama'].astype(object), Bulan=bulan, Status_Data=df['Status_Data'].astype(object).fillna('')) \
+        .groupby(['Nama', 'Bulan', 'Status_Data']).size().rename('Jumlah').reset_index()
+    return rekap[KOLOM_REKAP]
+
+
+def _baris_tap(taps):
+    """Tap (KOLOM_TAP + Ke) -> tuple (id, waktu, mch, ke, nama) untuk tabel tap_mentah; ID/Mch kosong jadi ''."""
+    return pd.DataFrame({
+        'id': taps['ID'].fillna('').astype(str),
+        'waktu': taps['Timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'mch': taps['Mch'].fillna('').astype(str),
+        'ke': taps['Ke'].astype(int),
+        'nama': taps['Nama'].astype(str),
+    }).itertuples(index=False, name=None)
+
+
+def _kunci_teks(kunci):
+    """Frame kunci (Nama, Tanggal) -> tuple (nama, 'YYYY-MM-DD')."""
+    return list(zip(kunci['Nama'].astype(str), pd.to_datetime(kunci['Tanggal']).dt.strftime('%Y-%m-%d')))
+
+
+def _tap_kosong():
+    return pd.DataFrame({'Nama': pd.Series(dtype=object), 'Timestamp': pd.Series(dtype='datetime64[ns]')})
+
+
+# --- LOG ---
+# Log_Sistem lokal dipartisi waktu: bulan-bulan terbaru di tabel log_sistem (ber-index waktu, aksi,
+# pengguna); bulan yang lebih lama dipadatkan ke log_arsip, satu baris JSON terkompresi zlib per
+# bulan beserta ringkasan jumlah per (aksi, pengguna) supaya filter tidak perlu membuka arsip.
+
+def _log_tampil(df):
+    """Frame log (KOLOM_LOG) -> KOLOM_LOG_TAMPIL, Pengguna diambil dari prefix "[user] " di Detail."""
+    detail = df['Detail'].fillna('').astype(str)
+    return pd.DataFrame({
+        'Waktu': df['Waktu'].fillna('').astype(str),
+        'Aksi': df['Aksi'].fillna('').astype(str),
+        'Pengguna': detail.str.extract(r'^\[([^\]]*)\]', expand=False).fillna(''),
+        'Detail': detail,
+    })[KOLOM_LOG_TAMPIL]
+
+
+def _rentang_log(dari, sampai):
+    """Tanggal inklusif -> (awal, akhir eksklusif) sebagai teks pembanding kolom waktu; None = terbuka."""
+    awal = None if dari is None else pd.Timestamp(dari).strftime('%Y-%m-%d')
+    akhir = None if sampai is None else (pd.Timestamp(sampai) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    return awal, akhir
+
+
+def saring_log(df, aksi=None, pengguna=None, dari=None, sampai=None):
+    """Baris log (KOLOM_LOG_TAMPIL) yang cocok filter, terbaru dulu (urutan catat untuk Waktu sama)."""
+    awal, akhir = _rentang_log(dari, sampai)
+    mask = np.ones(len(df), dtype=bool)
+    if aksi:
+        mask &= df['Aksi'].isin(aksi).to_numpy()
+    if pengguna:
+        mask &= df['Pengguna'].isin(pengguna).to_numpy()
+    if awal:
+        mask &= (df['Waktu'] >= awal).to_numpy()
+    if akhir:
+        mask &= (df['Waktu'] < akhir).to_numpy()
+    return df[mask].iloc[::-1].sort_values('Waktu', ascending=False, kind='mergesort')
+
+
+def _kemas_arsip(df):
+    return zlib.compress(json.dumps(df[KOLOM_LOG_TAMPIL].values.tolist()).encode(), 9)
+
+
+def _buka_arsip(isi):
+    return pd.DataFrame(json.loads(zlib.decompress(isi)), columns=KOLOM_LOG_TAMPIL)
+
+
+def _bytes_nilai(rows):
+    """Perkiraan ukuran payload tulis ke Sheets API."""
+    return len(json.dumps(rows, default=str))
+
+
+class Storage:
+    """Antarmuka backend. Semua halaman app.py membaca/menulis lewat method ini."""
+
+    def get_data(self):
+        """Seluruh Data_Utama sebagai frame bertipe (lihat ke_tipe)."""
+        raise NotImplementedError
+
+    def save_data(self, df):
+        """Simpan/perbarui baris per (Nama, Tanggal). Return baris yang benar-benar berubah."""
+        raise NotImplementedError
+
+    def hapus_data(self, kunci):
+        """Hapus baris untuk kunci (Nama, Tanggal) di frame `kunci`. Return jumlah baris terhapus."""
+        raise NotImplementedError
+
+    def clear_data(self):
+        raise NotImplementedError
+
+    def get_logs(self):
+        raise NotImplementedError
+
+    def add_logs(self, entries):
+        raise NotImplementedError
+
+    def query_logs(self, aksi=None, pengguna=None, dari=None, sampai=None, halaman=0, per_halaman=50):
+        """Halaman ke-`halaman` (mulai 0) log terbaru-dulu yang cocok filter (KOLOM_LOG_TAMPIL), dan jumlah totalnya.
+
+        `aksi`/`pengguna` daftar nilai (kosong = semua); `dari`/`sampai` tanggal inklusif (None = terbuka).
+        """
+        df = saring_log(_log_tampil(self.get_logs()), aksi, pengguna, dari, sampai)
+        mulai = halaman * per_halaman
+        return df.iloc[mulai:mulai + per_halaman].reset_index(drop=True), len(df)
+
+    def opsi_log(self):
+        """(daftar Aksi, daftar Pengguna) yang pernah tercatat, untuk pilihan filter."""
+        df = _log_tampil(self.get_logs())
+        return sorted(set(df['Aksi'])), sorted(set(df['Pengguna']) - {''})
+
+    def get_users(self):
+        raise NotImplementedError
+
+    def get_pegawai(self):
+        raise NotImplementedError
+
+    # Rekap & cuplikan Data_Utama; backend tanpa dukungan khusus menghitungnya dari get_data()
+    def get_rekap(self):
+        """Jumlah hari per (Nama, Bulan, Status_Data), lihat KOLOM_REKAP."""
+        return hitung_rekap(self.get_data())
+
+    def query_attendance(self, start, end, names=None):
+        """Baris dengan start <= Tanggal <= end (inklusif), opsional hanya untuk nama di `names`."""
+        df = self.get_data()
+        mask = df['Tanggal'].between(pd.Timestamp(start), pd.Timestamp(end))
+        if names:
+            mask &= df['Nama'].isin(names)
+        return df[mask.to_numpy()]
+
+    def get_terbaru(self, n, names=None):
+        """`n` baris dengan Tanggal terbaru, opsional hanya untuk nama di `names`."""
+        df = self.get_data()
+        if names:
+            df = df[df['Nama'].isin(names)]
+        return df.sort_values('Tanggal', ascending=False, kind='mergesort').head(n)
+
+    # Registri ingest (file & tap mentah); backend tanpa registri menganggap semuanya baru
+    def file_dikenal(self, sha256):
+        """Subset hash isi file (himpunan `sha256`) yang sudah pernah di-ingest."""
+        return set()
+
+    def tap_baru(self, taps):
+        """Mask boolean per baris `taps` (KOLOM_TAP + Ke): True bila KUNCI_TAP belum tersimpan."""
+        return np.ones(len(taps), dtype=bool)
+
+    def ambil_tap(self, jendela):
+        """Tap tersimpan (Nama, Timestamp) untuk tiap baris `jendela` (Nama, dari, sampai; tanggal inklusif)."""
+        return _tap_kosong()
+
+    def catat_ingest(self, taps, files):
+        """Catat tap (KOLOM_TAP + Ke) dan file (sha256, nama_file, jumlah_tap) yang sudah tersimpan."""
+
+    def versi(self, nama):
+        """Penanda versi murah untuk worksheet `nama`; None = tidak diketahui (selalu baca ulang)."""
+        return None
+
+    # Hook opsional untuk backend dengan mirror
+    def sync(self):
+        pass
+
+    def pull(self, penuh=False):
+        """Tarik perubahan master dari mirror; murah (tanpa unduhan) bila remote tidak berubah."""
+
+    def flush_logs(self):
+        pass
+
+    def start_background(self):
+        pass
+
+
+class SQLiteStorage(Storage):
+    """Backend lokal: satu file SQLite.
+
+    Tabel rekap_bulanan dipelihara inkremental oleh save_data: hanya pasangan
+    (nama, bulan) yang barisnya berubah yang dihitung ulang.
+    """
+
+    _SQL_DATA = ("SELECT nama AS Nama, tanggal AS Tanggal, jam_masuk AS Jam_Masuk, jam_pulang AS Jam_Pulang, "
+                 "status_data AS Status_Data FROM data_utama ")
+    _SQL_NAMA = "nama IN (SELECT value FROM json_each(?))"
+    _SQL_REKAP = ("SELECT d.nama, substr(d.tanggal, 1, 7), COALESCE(d.status_data, ''), COUNT(*) "
+                  "FROM {sumber} GROUP BY 1, 2, 3")
+    _SQL_LOG = "SELECT waktu AS Waktu, aksi AS Aksi, pengguna AS Pengguna, detail AS Detail FROM log_sistem "
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.lock_log = threading.Lock()  # rotasi arsip log: baca-ubah-tulis baris log_arsip
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SKEMA)
+            if db.execute("SELECT 1 FROM rekap_bulanan LIMIT 1").fetchone() is None:
+                # Database lama (sebelum ada rekap): bangun sekali dari data_utama
+                db.execute("INSERT INTO rekap_bulanan " + self._SQL_REKAP.format(sumber="data_utama d"))
+            if 'pengguna' not in [r[1] for r in db.execute("PRAGMA table_info(log_sistem)")]:
+                # Database lama (sebelum ada kolom pengguna): isi dari prefix "[user] " di detail
+                db.execute("ALTER TABLE log_sistem ADD COLUMN pengguna TEXT")
+                db.execute("UPDATE log_sistem SET pengguna = CASE WHEN detail LIKE '[%]%' "
+                           "THEN substr(detail, 2, instr(detail, ']') - 2) ELSE '' END")
+            if 'ke' not in [r[1] for r in db.execute("PRAGMA table_info(tap_mentah)")]:
+                # Database lama (kunci tap tanpa Ke): bangun ulang tabel, tap lama jadi kemunculan pertama
+                db.execute("ALTER TABLE tap_mentah RENAME TO tap_mentah_lama")
+                db.executescript(SKEMA)
+                db.execute("INSERT INTO tap_mentah (id, waktu, mch, nama, ke) "
+                           "SELECT id, waktu, mch, nama, 0 FROM tap_mentah_lama")
+                db.execute("DROP TABLE tap_mentah_lama")
+                db.execute("CREATE INDEX IF NOT EXISTS idx_tap_nama ON tap_mentah (nama, waktu)")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_log_aksi ON log_sistem (aksi, waktu)")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_log_pengguna ON log_sistem (pengguna, waktu)")
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield db
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _naikkan_versi(db, nama):
+        db.execute("INSERT INTO versi VALUES (?, 1) ON CONFLICT (nama) DO UPDATE SET nilai = nilai + 1", (nama,))
+
+    def versi(self, nama):
+        with self._db() as db:
+            row = db.execute("SELECT nilai FROM versi WHERE nama = ?", (nama,)).fetchone()
+        return 0 if row is None else row[0]
+
+    def is_empty(self):
+        with self._db() as db:
+            return db.execute("SELECT 1 FROM data_utama LIMIT 1").fetchone() is None
+
+    def get_data(self):
+        with span("sqlite.read:Data_Utama") as s, self._db() as db:
+            df = pd.read_sql_query(self._SQL_DATA + "ORDER BY rowid", db)
+            s['baris'] = len(df)
+        return ke_tipe(df)
+
+    def query_attendance(self, start, end, names=None):
+        # Rentang tanggal memakai idx_data_tanggal; hanya irisan yang diminta yang dibaca
+        sql = self._SQL_DATA + "WHERE tanggal BETWEEN ? AND ?"
+        params = [pd.Timestamp(start).strftime('%Y-%m-%d'), pd.Timestamp(end).strftime('%Y-%m-%d')]
+        if names:
+            sql += " AND " + self._SQL_NAMA
+            params.append(json.dumps(list(names)))
+        with span("sqlite.query:Data_Utama") as s, self._db() as db:
+            df = pd.read_sql_query(sql + " ORDER BY tanggal, nama", db, params=params)
+            s['baris'] = len(df)
+        return ke_tipe(df)
+
+    def save_data(self, df):
+        baru = siapkan_baris(df)
+        if baru.empty:
+            return baru[KOLOM_DATA]
+        with span("sqlite.write:Data_Utama") as s, self.lock, self._db() as db:
+            lama = pd.read_sql_query(
+                "SELECT nama AS Nama, tanggal AS Tanggal, digest AS digest_lama FROM data_utama "
+                "WHERE tanggal BETWEEN ? AND ?", db, params=(baru['Tanggal'].min(), baru['Tanggal'].max()))
+            cocok = baru.merge(lama, how='left', on=['Nama', 'Tanggal'])
+            berubah = cocok[cocok['digest'] != cocok['digest_lama']]
+            db.executemany(
+                "INSERT INTO data_utama (nama, tanggal, jam_masuk, jam_pulang, status_data, digest) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (nama, tanggal) DO UPDATE SET "
+                "jam_masuk = excluded.jam_masuk, jam_pulang = excluded.jam_pulang, "
+                "status_data = excluded.status_data, digest = excluded.digest",
+                berubah[KOLOM_DATA + ['digest']].itertuples(index=False, name=None))
+            if not berubah.empty:
+                self._perbarui_rekap(db, berubah)
+                self._naikkan_versi(db, "Data_Utama")
+            s['baris'] = len(berubah)
+        return berubah[KOLOM_DATA].reset_index(drop=True)
+
+    def _perbarui_rekap(self, db, berubah):
+        sentuh = pd.DataFrame({'nama': berubah['Nama'], 'bulan': berubah['Tanggal'].str[:7]}).drop_duplicates()
+        db.execute("CREATE TEMP TABLE IF NOT EXISTS sentuh (nama TEXT, bulan TEXT, PRIMARY KEY (nama, bulan))")
+        db.execute("DELETE FROM sentuh")
+        db.executemany("INSERT INTO sentuh VALUES (?, ?)", sentuh.itertuples(index=False, name=None))
+        db.execute("DELETE FROM rekap_bulanan WHERE (nama, bulan) IN (SELECT nama, bulan FROM sentuh)")
+        db.execute("INSERT INTO rekap_bulanan " + self._SQL_REKAP.format(
+            sumber="sentuh s JOIN data_utama d ON d.nama = s.nama "
+                   "AND d.tanggal BETWEEN s.bulan || '-01' AND s.bulan || '-31'"))
+
+    def hapus_data(self, kunci):
+        kunci = _kunci_teks(kunci)
+        if not kunci:
+            return 0
+        with span("sqlite.delete:Data_Utama", baris=len(kunci)), self.lock, self._db() as db:
+            jumlah = db.executemany("DELETE FROM data_utama WHERE nama = ? AND tanggal = ?", kunci).rowcount
+            if jumlah:
+                self._perbarui_rekap(db, pd.DataFrame(kunci, columns=['Nama', 'Tanggal']))
+                self._naikkan_versi(db, "Data_Utama")
+        return jumlah
+
+    def get_rekap(self):
+        with self._db() as db:
+            return pd.read_sql_query(
+                "SELECT nama AS Nama, bulan AS Bulan, status_data AS Status_Data, jumlah AS Jumlah "
+                "FROM rekap_bulanan ORDER BY nama, bulan", db)
+
+    def get_terbaru(self, n, names=None):
+        filter_nama = "WHERE " + self._SQL_NAMA if names else ""
+        with self._db() as db:
+            df = pd.read_sql_query(self._SQL_DATA + filter_nama + " ORDER BY tanggal DESC, rowid LIMIT ?",
+                                   db, params=((json.dumps(list(names)),) if names else ()) + (n,))
+        return ke_tipe(df)
+
+    def clear_data(self):
+        with self.lock, self._db() as db:
+            db.execute("DELETE FROM data_utama")
+            db.execute("DELETE FROM rekap_bulanan")
+            # Registri ikut dikosongkan supaya file yang sama bisa di-upload ulang
+            db.execute("DELETE FROM tap_mentah")
+            db.execute("DELETE FROM file_masuk")
+            self._naikkan_versi(db, "Data_Utama")
+
+    def file_dikenal(self, sha256):
+        with self._db() as db:
+            return {r[0] for r in db.execute("SELECT sha256 FROM file_masuk WHERE sha256 IN (SELECT value FROM json_each(?))",
+                                             (json.dumps(sorted(sha256)),))}
+
+    def tap_baru(self, taps):
+        baru = np.ones(len(taps), dtype=bool)
+        if taps.empty:
+            return baru
+        with span("sqlite.cek:tap_mentah", baris=len(taps)), self._db() as db:
+            if db.execute("SELECT 1 FROM tap_mentah LIMIT 1").fetchone() is None:
+                return baru
+            db.execute("CREATE TEMP TABLE IF NOT EXISTS tap_cek (i INTEGER PRIMARY KEY, id TEXT, waktu TEXT, mch TEXT, ke INTEGER)")
+            db.execute("DELETE FROM tap_cek")
+            db.executemany("INSERT INTO tap_cek VALUES (?, ?, ?, ?, ?)",
+                           ((i, *row[:4]) for i, row in enumerate(_baris_tap(taps))))
+            lama = [r[0] for r in db.execute(
+                "SELECT c.i FROM tap_cek c JOIN tap_mentah t "
+                "ON t.id = c.id AND t.waktu = c.waktu AND t.mch = c.mch AND t.ke = c.ke")]
+        baru[lama] = False
+        return baru
+
+    def ambil_tap(self, jendela):
+        if jendela.empty:
+            return _tap_kosong()
+        rentang = pd.DataFrame({
+            'nama': jendela['Nama'].astype(str),
+            'dari': pd.to_datetime(jendela['dari']).dt.strftime('%Y-%m-%d'),
+            'sampai': (pd.to_datetime(jendela['sampai']) + pd.Timedelta(days=1)).dt.strftime('%Y-%m-%d'),
+        })
+        with span("sqlite.read:tap_mentah") as s, self._db() as db:
+            db.execute("CREATE TEMP TABLE IF NOT EXISTS jendela (nama TEXT, dari TEXT, sampai TEXT)")
+            db.execute("DELETE FROM jendela")
+            db.executemany("INSERT INTO jendela VALUES (?, ?, ?)", rentang.itertuples(index=False, name=None))
+            # idx_tap_nama: satu range scan (nama, waktu) per jendela
+            df = pd.read_sql_query(
+                "SELECT t.nama AS Nama, t.waktu AS Timestamp FROM jendela j JOIN tap_mentah t "
+                "ON t.nama = j.nama AND t.waktu >= j.dari AND t.waktu < j.sampai", db)
+            s['baris'] = len(df)
+        df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='%Y-%m-%d %H:%M:%S')
+        return df
+
+    def catat_ingest(self, taps, files):
+        waktu = time.strftime('%Y-%m-%d %H:%M:%S')
+        with span("sqlite.write:tap_mentah", baris=len(taps)), self.lock, self._db() as db:
+            db.executemany("INSERT OR IGNORE INTO tap_mentah (id, waktu, mch, ke, nama) VALUES (?, ?, ?, ?, ?)",
+                           _baris_tap(taps))
+            db.executemany("INSERT OR REPLACE INTO file_masuk VALUES (?, ?, ?, ?)",
+                           [(sha, nama, waktu, jumlah) for sha, nama, jumlah in files])
+
+    def get_logs(self):
+        """Seluruh log (arsip lalu log_sistem) urut catat; untuk viewer pakai query_logs."""
+        with self._db() as db:
+            arsip = [_buka_arsip(isi) for (isi,) in db.execute("SELECT isi FROM log_arsip ORDER BY bulan")]
+            baru = pd.read_sql_query(self._SQL_LOG + "ORDER BY id", db)
+        return pd.concat(arsip + [baru], ignore_index=True)[KOLOM_LOG] if arsip else baru[KOLOM_LOG]
+
+    def add_logs(self, entries):
+        rows = _log_tampil(pd.DataFrame(list(entries), columns=KOLOM_LOG))
+        with span("sqlite.write:Log_Sistem", baris=len(rows)), self._db() as db:
+            db.executemany("INSERT INTO log_sistem (waktu, aksi, pengguna, detail) VALUES (?, ?, ?, ?)",
+                           rows.itertuples(index=False, name=None))
+            self._naikkan_versi(db, "Log_Sistem")
+        self.rotasi_log()
+
+    def rotasi_log(self):
+        """Pindahkan bulan yang lebih tua dari RETENSI_LOG_BULAN ke log_arsip. Return jumlah baris dipindah.
+
+        Patokan umur adalah bulan log terbaru, bukan jam server; baris dengan Waktu tak berformat
+        'YYYY-MM-...' dibiarkan di log_sistem.
+        """
+        with self.lock_log, self._db() as db:
+            terbaru, terlama = db.execute("SELECT MAX(waktu), MIN(waktu) FROM log_sistem").fetchone()
+            try:
+                batas = (pd.Period(terbaru[:7], 'M') - RETENSI_LOG_BULAN).strftime('%Y-%m')
+            except (TypeError, ValueError):
+                return 0
+            if terlama[:7] >= batas:
+                return 0  # jalur umum tiap add_logs: dua lookup index, tidak ada yang diarsipkan
+            with span("sqlite.rotasi:Log_Sistem") as s:
+                df = pd.read_sql_query("SELECT id, waktu AS Waktu, aksi AS Aksi, pengguna AS Pengguna, detail AS Detail "
+                                       "FROM log_sistem WHERE waktu < ? ORDER BY waktu, id", db, params=(batas,))
+                df = df[df['Waktu'].str.match(r'\d{4}-\d{2}')]
+                for bulan, bagian in df.groupby(df['Waktu'].str[:7]):
+                    lama = db.execute("SELECT isi FROM log_arsip WHERE bulan = ?", (bulan,)).fetchone()
+                    if lama is not None:  # log terlambat (mis. tarikan dari mirror) untuk bulan yang sudah diarsip
+                        bagian = pd.concat([_buka_arsip(lama[0]), bagian[KOLOM_LOG_TAMPIL]], ignore_index=True) \
+                            .sort_values('Waktu', kind='mergesort')
+                    ringkas = bagian.groupby(['Aksi', 'Pengguna']).size().reset_index().values.tolist()
+                    db.execute("INSERT OR REPLACE INTO log_arsip VALUES (?, ?, ?, ?)",
+                               (bulan, len(bagian), json.dumps(ringkas), _kemas_arsip(bagian)))
+                db.execute("DELETE FROM log_sistem WHERE id IN (SELECT value FROM json_each(?))",
+                           (json.dumps(df['id'].tolist()),))
+                s['baris'] = len(df)
+            return len(df)
+
+    def query_logs(self, aksi=None, pengguna=None, dari=None, sampai=None, halaman=0, per_halaman=50):
+        # log_sistem: COUNT + LIMIT/OFFSET lewat index; arsip hanya dibuka untuk bulan yang isinya
+        # diminta halaman ini atau yang terpotong rentang tanggal (selain itu jumlah dari ringkasan)
+        awal, akhir = _rentang_log(dari, sampai)
+        syarat, params = [], []
+        if aksi:
+            syarat.append("aksi IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(aksi)))
+        if pengguna:
+            syarat.append("pengguna IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(pengguna)))
+        if awal:
+            syarat.append("waktu >= ?")
+            params.append(awal)
+        if akhir:
+            syarat.append("waktu < ?")
+            params.append(akhir)
+        where = "WHERE " + " AND ".join(syarat) + " " if syarat else ""
+        mulai = halaman * per_halaman
+        with span("sqlite.read:Log_Sistem") as s, self._db() as db:
+            total = db.execute("SELECT COUNT(*) FROM log_sistem " + where, params).fetchone()[0]
+            bagian = [pd.read_sql_query(self._SQL_LOG + where + "ORDER BY waktu DESC, id DESC LIMIT ? OFFSET ?",
+                                        db, params=params + [per_halaman, mulai])]
+            arsip = db.execute("SELECT bulan, ringkas FROM log_arsip WHERE bulan >= ? AND bulan <= ? ORDER BY bulan DESC",
+                               ((awal or '')[:7], '~' if sampai is None else pd.Timestamp(sampai).strftime('%Y-%m'))).fetchall()
+            sisa = per_halaman - len(bagian[0])
+            lewati = max(0, mulai - total)
+            for bulan, ringkas in arsip:
+                utuh = (not awal or awal <= f"{bulan}-01") and \
+                       (not akhir or akhir >= (pd.Period(bulan, 'M') + 1).strftime('%Y-%m-01'))
+                isi = None
+                if utuh:
+                    jumlah = sum(n for a, p, n in json.loads(ringkas)
+                                 if (not aksi or a in aksi) and (not pengguna or p in pengguna))
+                else:
+                    isi = self._arsip_cocok(db, bulan, aksi, pengguna, dari, sampai)
+                    jumlah = len(isi)
+                total += jumlah
+                if sisa > 0 and lewati < jumlah:
+                    if isi is None:
+                        isi = self._arsip_cocok(db, bulan, aksi, pengguna, dari, sampai)
+                    bagian.append(isi.iloc[lewati:lewati + sisa])
+                    sisa -= len(bagian[-1])
+                lewati = max(0, lewati - jumlah)
+            df = pd.concat(bagian, ignore_index=True) if len(bagian) > 1 else bagian[0]
+            s['baris'] = len(df)
+        return df, total
+
+    @staticmethod
+    def _arsip_cocok(db, bulan, aksi, pengguna, dari, sampai):
+        (isi,) = db.execute("SELECT isi FROM log_arsip WHERE bulan = ?", (bulan,)).fetchone()
+        return saring_log(_buka_arsip(isi), aksi, pengguna, dari, sampai)
+
+    def opsi_log(self):
+        with self._db() as db:
+            aksi = {r[0] for r in db.execute("SELECT DISTINCT aksi FROM log_sistem")}
+            pengguna = {r[0] for r in db.execute("SELECT DISTINCT pengguna FROM log_sistem")}
+            for (ringkas,) in db.execute("SELECT ringkas FROM log_arsip"):
+                for a, p, _ in json.loads(ringkas):
+                    aksi.add(a)
+                    pengguna.add(p)
+        return sorted(aksi - {None}), sorted(pengguna - {None, ''})
+
+    def get_users(self):
+        with self._db() as db:
+            return pd.read_sql_query(
+                "SELECT username AS Username, password AS Password, role AS Role, "
+                "nama_lengkap AS Nama_Lengkap FROM users", db)
+
+    def set_users(self, df):
+        """Ganti isi tabel users; password teks polos disimpan sebagai hash ber-salt."""
+        df = df.reindex(columns=KOLOM_USERS).dropna(subset=['Username'])
+        with self._db() as db:
+            lama = dict(db.execute("SELECT username, password FROM users"))
+            df = df.assign(Username=df['Username'].astype(str).str.strip())
+            df['Password'] = [amankan_password(pw, lama.get(u)) for u, pw in zip(df['Username'], df['Password'])]
+            db.execute("DELETE FROM users")
+            db.executemany("INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?)",
+                           df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+            self._naikkan_versi(db, "Users")
+
+    def get_pegawai(self):
+        with self._db() as db:
+            return [r[0] for r in db.execute("SELECT nama FROM pegawai ORDER BY nama")]
+
+    def set_pegawai(self, names):
+        with self._db() as db:
+            db.execute("DELETE FROM pegawai")
+            db.executemany("INSERT OR IGNORE INTO pegawai VALUES (?)", [(n,) for n in names])
+            self._naikkan_versi(db, "Data_Pegawai")
+
+
+class GSheetsStorage(Storage):
+    """Backend Google Sheets lewat GSheetsConnection.
+
+    Menyimpan index kunci lokal (Nama, Tanggal) -> nomor baris + digest isi, supaya
+    save_data cukup append baris baru / patch baris berubah tanpa unduhan penuh.
+    """
+
+    def __init__(self, conn, index_path):
+        self.conn = conn
+        self.index_path = index_path
+        self.lock = threading.Lock()
+        self.header_log_ok = False
+        self._spreadsheet = None
+
+    def worksheet(self, nama):
+        """Worksheet gspread mentah, untuk append/patch yang tidak tersedia di API GSheetsConnection."""
+        return self.conn.client._select_worksheet(worksheet=nama)
+
+    def revisi(self):
+        """Waktu modifikasi terakhir spreadsheet (metadata Drive, tanpa mengunduh isi sheet)."""
+        with span("gsheets.revisi"):
+            if self._spreadsheet is None:
+                self._spreadsheet = self.conn.client._open_spreadsheet()
+            # Properti lastUpdateTime hanya diisi saat spreadsheet dibuka; ambil ulang dari Drive tiap cek
+            return self._spreadsheet.get_lastUpdateTime()
+
+    def _read(self, nama):
+        with span(f"gsheets.read:{nama}") as s:
+            df = self.conn.read(worksheet=nama, ttl=0)
+            s['baris'], s['bytes'] = len(df), ukuran_df(df)
+        return df
+
+    def _update(self, nama, df):
+        with span(f"gsheets.update:{nama}", baris=len(df), bytes=ukuran_df(df)):
+            self.conn.update(worksheet=nama, data=df)
+
+    def _append(self, nama, rows, value_input_option):
+        with span(f"gsheets.append:{nama}", baris=len(rows), bytes=_bytes_nilai(rows)):
+            return self.worksheet(nama).append_rows(rows, value_input_option=value_input_option)
+
+    # --- index kunci lokal ---
+    def _buka_index(self):
+        os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+        db = sqlite3.connect(self.index_path, timeout=30)
+        db.execute("CREATE TABLE IF NOT EXISTS kunci (nama TEXT, tanggal TEXT, baris INTEGER, digest TEXT, PRIMARY KEY (nama, tanggal))")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_kunci_tanggal ON kunci (tanggal)")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (nama TEXT PRIMARY KEY, nilai INTEGER)")
+        return db
+
+    @staticmethod
+    def _jumlah_baris(db):
+        row = db.execute("SELECT nilai FROM meta WHERE nama = 'jumlah_baris'").fetchone()
+        return None if row is None else row[0]
+
+    @staticmethod
+    def _reset_index(db, jumlah_baris=None):
+        db.execute("DELETE FROM kunci")
+        db.execute("DELETE FROM meta")
+        if jumlah_baris is not None:
+            db.execute("INSERT INTO meta VALUES ('jumlah_baris', ?)", (jumlah_baris,))
+        db.commit()
+
+    def _baca_posisi(self):
+        """Data_Utama mentah, index = nomor baris di sheet (baris kosong di tengah tetap terhitung)."""
+        with span("gsheets.read:Data_Utama") as s:
+            nilai = self.worksheet("Data_Utama").get_all_values()
+            s['baris'] = max(len(nilai) - 1, 0)
+        if len(nilai) < 2:
+            return 0, _data_kosong()
+        df = pd.DataFrame(nilai[1:], columns=[str(k).strip() for k in nilai[0]], index=range(2, len(nilai) + 1))
+        df = df.reindex(columns=KOLOM_DATA, fill_value='')
+        return len(nilai) - 1, df[(df['Nama'].str.strip() != '') & (df['Tanggal'].str.strip() != '')]
+
+    def _bangun_index(self, db, revisi=None):
+        """Bangun ulang index dari satu kali unduhan penuh (hanya saat index belum ada / sheet diubah pihak lain)."""
+        jumlah, df = self._baca_posisi()
+        self._reset_index(db, jumlah)
+        self._catat_revisi(db, revisi)
+        if not df.empty:
+            # drop_duplicates di siapkan_baris mempertahankan index, jadi nomor baris tetap posisi asli di sheet
+            rows = siapkan_baris(ke_tipe(df))
+            db.executemany("INSERT OR REPLACE INTO kunci VALUES (?, ?, ?, ?)",
+                           zip(rows['Nama'], rows['Tanggal'], rows.index.tolist(), rows['digest']))
+            db.commit()
+
+    @staticmethod
+    def _catat_revisi(db, revisi):
+        db.execute("INSERT OR REPLACE INTO meta VALUES ('revisi', ?)", (revisi,))
+        db.commit()
+
+    def _revisi_diam(self):
+        try:
+            return self.revisi()
+        except Exception:
+            return None
+
+    def _siapkan_index(self, db):
+        """Index siap pakai: dibangun ulang bila belum ada, atau revisi sheet berubah sejak tulisan terakhir kita
+        (edit / sort / hapus manual menggeser nomor baris). Revisi tidak terbaca: bangun ulang demi aman."""
+        revisi = self._revisi_diam()
+        row = db.execute("SELECT nilai FROM meta WHERE nama = 'revisi'").fetchone()
+        if self._jumlah_baris(db) is None or revisi is None or row is None or row[0] != revisi:
+            self._bangun_index(db, revisi)
+
+    @staticmethod
+    def _baris_awal_append(respon, default):
+        # updatedRange contoh: "Data_Utama!A120:E135"
+        try:
+            rentang = respon['updates']['updatedRange'].split('!')[-1].split(':')[0]
+            return int(''.join(c for c in rentang if c.isdigit()))
+        except Exception:
+            return default
+
+    # --- Data_Utama ---
+    def get_data(self):
+        df = self._read("Data_Utama")
+        if df.empty:
+            return _data_kosong_tipe()
+        return ke_tipe(df)
+
+    def save_data(self, df):
+        with self.lock:
+            db = self._buka_index()
+            try:
+                self._siapkan_index(db)
+                jumlah = self._jumlah_baris(db)
+
+                baru = siapkan_baris(df)
+                lama = pd.read_sql_query(
+                    "SELECT nama AS Nama, tanggal AS Tanggal, baris, digest AS digest_lama FROM kunci WHERE tanggal BETWEEN ? AND ?",
+                    db, params=(baru['Tanggal'].min(), baru['Tanggal'].max()))
+                cocok = baru.merge(lama, how='left', on=['Nama', 'Tanggal'])
+                tambah = cocok[cocok['baris'].isna()]
+                ubah = cocok[cocok['baris'].notna() & (cocok['digest'] != cocok['digest_lama'])]
+
+                if jumlah == 0 and not tambah.empty:
+                    # Sheet masih kosong: tulis header + data sekaligus
+                    self._update("Data_Utama", tambah[KOLOM_DATA])
+                    baris_awal = 2
+                elif not tambah.empty:
+                    respon = self._append("Data_Utama", tambah[KOLOM_DATA].values.tolist(), 'USER_ENTERED')
+                    baris_awal = self._baris_awal_append(respon, jumlah + 2)
+                if not ubah.empty:
+                    patch = [{'range': f"A{int(b)}:E{int(b)}", 'values': [row]}
+                             for b, row in zip(ubah['baris'], ubah[KOLOM_DATA].values.tolist())]
+                    with span("gsheets.patch:Data_Utama", baris=len(patch), bytes=_bytes_nilai(patch)):
+                        self.worksheet("Data_Utama").batch_update(patch, value_input_option='USER_ENTERED')
+
+                if not tambah.empty:
+                    db.executemany("INSERT OR REPLACE INTO kunci VALUES (?, ?, ?, ?)",
+                                   zip(tambah['Nama'], tambah['Tanggal'], range(baris_awal, baris_awal + len(tambah)), tambah['digest']))
+                    db.execute("UPDATE meta SET nilai = ? WHERE nama = 'jumlah_baris'", (jumlah + len(tambah),))
+                if not ubah.empty:
+                    db.executemany("UPDATE kunci SET digest = ? WHERE nama = ? AND tanggal = ?",
+                                   zip(ubah['digest'], ubah['Nama'], ubah['Tanggal']))
+                if not tambah.empty or not ubah.empty:
+                    self._catat_revisi(db, self._revisi_diam())
+                db.commit()
+            except Exception:
+                # Status sheet tidak pasti setelah gagal tulis: paksa bangun ulang index berikutnya
+                self._reset_index(db)
+                raise
+            finally:
+                db.close()
+        return pd.concat([tambah, ubah])[KOLOM_DATA].reset_index(drop=True)
+
+    def hapus_data(self, kunci):
+        kunci = _kunci_teks(kunci)
+        if not kunci:
+            return 0
+        with self.lock:
+            db = self._buka_index()
+            try:
+                self._siapkan_index(db)
+                nomor = sorted((r[0] for k in kunci
+                                for r in db.execute("SELECT baris FROM kunci WHERE nama = ? AND tanggal = ?", k)),
+                               reverse=True)
+                if nomor:
+                    # Dari bawah ke atas supaya nomor baris yang belum dihapus tidak bergeser
+                    ws = self.worksheet("Data_Utama")
+                    permintaan = [{'deleteDimension': {'range': {'sheetId': ws.id, 'dimension': 'ROWS',
+                                                                 'startIndex': b - 1, 'endIndex': b}}} for b in nomor]
+                    with span("gsheets.delete:Data_Utama", baris=len(nomor)):
+                        ws.spreadsheet.batch_update({'requests': permintaan})
+                    for b in nomor:
+                        db.execute("DELETE FROM kunci WHERE baris = ?", (b,))
+                        db.execute("UPDATE kunci SET baris = baris - 1 WHERE baris > ?", (b,))
+                    db.execute("UPDATE meta SET nilai = nilai - ? WHERE nama = 'jumlah_baris'", (len(nomor),))
+                    self._catat_revisi(db, self._revisi_diam())
+                    db.commit()
+            except Exception:
+                self._reset_index(db)
+                raise
+            finally:
+                db.close()
+        return len(nomor)
+
+    def clear_data(self):
+        with self.lock:
+            self._update("Data_Utama", _data_kosong())
+            db = self._buka_index()
+            self._reset_index(db, 0)
+            self._catat_revisi(db, self._revisi_diam())
+            db.close()
+
+    # --- Log_Sistem ---
+    def get_logs(self):
+        df_logs = self._read("Log_Sistem")
+        if df_logs.empty:
+            return pd.DataFrame(columns=KOLOM_LOG)
+        return df_logs
+
+    def add_logs(self, entries):
+        ws = self.worksheet("Log_Sistem")
+        if not self.header_log_ok:
+            if not ws.row_values(1):
+                ws.append_row(KOLOM_LOG)
+            self.header_log_ok = True
+        rows = [[e[k] for k in KOLOM_LOG] for e in entries]
+        with span("gsheets.append:Log_Sistem", baris=len(rows), bytes=_bytes_nilai(rows)):
+            ws.append_rows(rows, value_input_option='RAW')
+
+    # --- Master ---
+    def get_users(self):
+        return self._read("Users")
+
+    def get_pegawai(self):
+        df_pegawai = self._read("Data_Pegawai")
+        return df_pegawai['Nama'].dropna().tolist()
+
+
+class LogSpool:
+    """Buffer entri (log audit, kunci hapus tertunda) di file spool lokal, di-flush ke backend tujuan sebagai batch.
+
+    Setiap entri langsung ditulis (fsync) ke spool sehingga tetap aman bila proses crash;
+    spool baru dihapus setelah pengiriman berhasil.
+    """
+
+    def __init__(self, path, kirim_fn):
+        self.path = path
+        self.kirim_fn = kirim_fn
+        self.lock = threading.Lock()
+
+    def tambah(self, entries):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(dict(entry, ts=time.time())) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def pending(self):
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue  # baris terakhir terpotong karena crash saat menulis
+        return entries
+
+    def perlu_flush(self):
+        entries = self.pending()
+        if not entries:
+            return False
+        return len(entries) >= LOG_BATCH or time.time() - entries[0].get('ts', 0) >= LOG_INTERVAL
+
+    def flush(self):
+        with self.lock:
+            entries = self.pending()
+            if not entries:
+                return 0
+            self.kirim_fn(entries)
+            os.remove(self.path)
+            return len(entries)
+
+    def flush_diam(self):
+        # Untuk thread latar & atexit: gagal flush berarti entri tetap di spool untuk percobaan berikutnya
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+
+class MirrorStorage(Storage):
+    """Baca dari backend lokal; tulis ke lokal lalu ke mirror remote (Google Sheets)."""
+
+    def __init__(self, lokal, remote, spool_path):
+        self.lokal = lokal
+        self.remote = remote
+        self.spool = LogSpool(spool_path, remote.add_logs)
+        # Kunci (Nama, Tanggal) yang sudah terhapus lokal tetapi gagal dihapus di remote; diulang saat sync()
+        self.spool_hapus = LogSpool(os.path.join(os.path.dirname(spool_path), "spool_hapus.jsonl"), self._hapus_tertunda)
+        self.galat_awal = None
+        self._revisi_remote = None
+        self.lock_pull = threading.Lock()
+        if lokal.is_empty():
+            try:
+                self.pull(penuh=True)
+            except Exception as e:
+                # Remote tidak terjangkau: tetap jalan dengan data lokal, coba lagi saat sync()
+                self.galat_awal = e
+
+    def get_data(self):
+        return self.lokal.get_data()
+
+    def save_data(self, df):
+        berubah = self.lokal.save_data(df)
+        if not berubah.empty:
+            try:
+                self.remote.save_data(berubah)
+            except Exception as e:
+                raise MirrorGagal(str(e)) from e
+        return berubah
+
+    def hapus_data(self, kunci):
+        jumlah = self.lokal.hapus_data(kunci)
+        if jumlah:
+            try:
+                self.remote.hapus_data(kunci)
+            except Exception as e:
+                self.spool_hapus.tambah([{'Nama': nama, 'Tanggal': tgl} for nama, tgl in _kunci_teks(kunci)])
+                raise MirrorGagal(str(e)) from e
+        return jumlah
+
+    def _hapus_tertunda(self, entries):
+        kunci = pd.DataFrame(entries, columns=['Nama', 'Tanggal']).drop_duplicates(ignore_index=True)
+        # Kunci yang sejak itu diisi lagi lokal tidak dihapus (barisnya sudah/akan didorong ulang)
+        ada = self.lokal.query_attendance(kunci['Tanggal'].min(), kunci['Tanggal'].max(), kunci['Nama'].unique().tolist())
+        ada = set(_kunci_teks(ada))
+        kunci = kunci[[k not in ada for k in _kunci_teks(kunci)]]
+        if not kunci.empty:
+            self.remote.hapus_data(kunci)
+
+    def clear_data(self):
+        self.lokal.clear_data()
+        try:
+            self.remote.clear_data()
+        except Exception as e:
+            raise MirrorGagal(str(e)) from e
+
+    def get_logs(self):
+        return self.lokal.get_logs()
+
+    def add_logs(self, entries):
+        self.lokal.add_logs(entries)
+        self.spool.tambah(entries)
+        if self.spool.perlu_flush():
+            self.spool.flush_diam()
+
+    def query_logs(self, aksi=None, pengguna=None, dari=None, sampai=None, halaman=0, per_halaman=50):
+        return self.lokal.query_logs(aksi, pengguna, dari, sampai, halaman, per_halaman)
+
+    def opsi_log(self):
+        return self.lokal.opsi_log()
+
+    def get_users(self):
+        return self.lokal.get_users()
+
+    def get_pegawai(self):
+        return self.lokal.get_pegawai()
+
+    def get_rekap(self):
+        return self.lokal.get_rekap()
+
+    def query_attendance(self, start, end, names=None):
+        return self.lokal.query_attendance(start, end, names)
+
+    def get_terbaru(self, n, names=None):
+        return self.lokal.get_terbaru(n, names)
+
+    # Registri ingest hanya ada di backend lokal
+    def file_dikenal(self, sha256):
+        return self.lokal.file_dikenal(sha256)
+
+    def tap_baru(self, taps):
+        return self.lokal.tap_baru(taps)
+
+    def ambil_tap(self, jendela):
+        return self.lokal.ambil_tap(jendela)
+
+    def catat_ingest(self, taps, files):
+        self.lokal.catat_ingest(taps, files)
+
+    def versi(self, nama):
+        return self.lokal.versi(nama)
+
+    def pull(self, penuh=False):
+        """Tarik master (Users, Data_Pegawai) dari remote; `penuh` juga menarik Data_Utama & Log_Sistem.
+
+        Tanpa `penuh`, tarikan dilewati bila revisi spreadsheet tidak berubah sejak tarikan terakhir.
+        """
+        with self.lock_pull:
+            try:
+                revisi = self.remote.revisi()
+            except Exception:
+                revisi = None
+            if not penuh and revisi is not None and revisi == self._revisi_remote:
+                return
+            if penuh:
+                # Hapus tertunda dulu, supaya baris yang sudah dihapus lokal tidak ikut tertarik kembali
+                self.spool_hapus.flush()
+            users = self.remote.get_users()
+            if not users.empty:
+                self.lokal.set_users(users)
+            self.lokal.set_pegawai(self.remote.get_pegawai())
+            if penuh:
+                self.lokal.save_data(self.remote.get_data())
+                logs = self.remote.get_logs()
+                if not logs.empty:
+                    self.lokal.add_logs(logs.reindex(columns=KOLOM_LOG).fillna('').astype(str).to_dict('records'))
+            self._revisi_remote = revisi
+
+    def pull_diam(self):
+        # Untuk thread latar: gagal tarik dicoba lagi di putaran berikutnya
+        try:
+            self.pull(penuh=self.galat_awal is not None)
+            self.galat_awal = None
+        except Exception:
+            pass
+
+    def sync(self):
+        """Dorong baris lokal yang belum ada/berbeda di remote, kirim log tertunda, lalu tarik master."""
+        try:
+            # Hapus tertunda sebelum dorong ulang: kunci yang sudah diisi lagi lokal ikut terdorong kembali
+            self.spool_hapus.flush()
+            self.remote.save_data(self.lokal.get_data())
+            self.spool.flush()
+            self.pull(penuh=self.galat_awal is not None)
+            self.galat_awal = None
+        except Exception as e:
+            raise MirrorGagal(str(e)) from e
+
+    def flush_logs(self):
+        self.spool.flush_diam()
+
+    def start_background(self):
+        def _loop():
+            while True:
+                time.sleep(LOG_INTERVAL)
+                if self.spool.perlu_flush():
+                    self.spool.flush_diam()
+                if self.spool_hapus.pending():
+                    self.spool_hapus.flush_diam()
+
+        def _loop_pull():
+            # Edit langsung di sheet Users / Data_Pegawai sampai ke app tanpa tombol Refresh
+            while True:
+                time.sleep(PULL_INTERVAL)
+                self.pull_diam()
+        threading.Thread(target=_loop, daemon=True).start()
+        threading.Thread(target=_loop_pull, daemon=True).start()
+
+
+class PdfCache:
+    """Cache PDF laporan di disk, dialamatkan oleh isi: (tahun, bulan, hash baris, versi layout).
+
+    Entri yang paling lama tidak dipakai dibuang bila jumlah file / total ukuran melewati batas.
+    """
+
+    def __init__(self, folder, maks_file=200, maks_bytes=200 * 1024 * 1024):
+        self.folder = folder
+        self.maks_file = maks_file
+        self.maks_bytes = maks_bytes
+        self.lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def kunci(df, year, month, versi_layout):
+        rows = df[KOLOM_DATA].astype(str).sort_values(['Nama', 'Tanggal'], kind='mergesort')
+        h = hashlib.sha256(f"{year}-{month}-{versi_layout}".encode())
+        h.update(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+        return h.hexdigest()[:32]
+
+    def _path(self, year, month, kunci):
+        return os.path.join(self.folder, f"{year:04d}-{month:02d}-{kunci}.pdf")
+
+    def get(self, year, month, kunci):
+        path = self._path(year, month, kunci)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # tandai baru dipakai (LRU)
+            return data
+        except FileNotFoundError:
+            return None
+
+    def put(self, year, month, kunci, data):
+        path = self._path(year, month, kunci)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self):
+        with self.lock:
+            files = []
+            for nama in os.listdir(self.folder):
+                if nama.endswith('.pdf'):
+                    st_ = os.stat(os.path.join(self.folder, nama))
+                    files.append((st_.st_mtime, st_.st_size, nama))
+            files.sort()
+            total = sum(f[1] for f in files)
+            while files and (len(files) > self.maks_file or total > self.maks_bytes):
+                _, size, nama = files.pop(0)
+                try:
+                    os.remove(os.path.join(self.folder, nama))
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def hapus_bulan(self, year, month):
+        awalan = f"{year:04d}-{month:02d}-"
+        for nama in os.listdir(self.folder):
+            if nama.startswith(awalan):
+                try:
+                    os.remove(os.path.join(self.folder, nama))
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+        for nama in os.listdir(self.folder):
+            if nama.endswith('.pdf'):
+                os.remove(os.path.join(self.folder, nama))
+
+
+class CachedStorage(Storage):
+    """Cache read-through per worksheet di atas backend lain.
+
+    Setiap baca mengecek `versi()` backend (satu query kecil); isi hanya diambil ulang bila
+    versinya berubah. Penulisan hanya menginvalidasi worksheet yang disentuh.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.lock = threading.Lock()
+        self._cache = {}  # nama worksheet -> (versi, nilai)
+
+    def __getattr__(self, nama):
+        # Atribut khusus backend (mis. galat_awal) diteruskan apa adanya
+        return getattr(self.inner, nama)
+
+    def _baca(self, nama, ambil, kunci=None):
+        # `kunci` membedakan turunan dari worksheet yang sama (mis. rekap dari Data_Utama)
+        kunci = kunci or nama
+        versi = self.inner.versi(nama)
+        with self.lock:
+            hit = self._cache.get(kunci)
+        if versi is not None and hit is not None and hit[0] == versi:
+            return hit[1]
+        nilai = ambil()
+        with self.lock:
+            self._cache[kunci] = (versi, nilai)
+        return nilai
+
+    def invalidate(self, nama=None):
+        with self.lock:
+            if nama is None:
+                self._cache.clear()
+            else:
+                for kunci in [k for k in self._cache if k.split(':')[0] == nama]:
+                    del self._cache[kunci]
+
+    def get_data(self):
+        # Salinan: pemanggil boleh mengubah frame tanpa merusak isi cache
+        return self._baca("Data_Utama", self.inner.get_data).copy()
+
+    def save_data(self, df):
+        try:
+            return self.inner.save_data(df)
+        finally:
+            self.invalidate("Data_Utama")
+
+    def hapus_data(self, kunci):
+        try:
+            return self.inner.hapus_data(kunci)
+        finally:
+            self.invalidate("Data_Utama")
+
+    def clear_data(self):
+        try:
+            self.inner.clear_data()
+        finally:
+            self.invalidate("Data_Utama")
+
+    def get_logs(self):
+        return self._baca("Log_Sistem", self.inner.get_logs).copy()
+
+    def add_logs(self, entries):
+        try:
+            self.inner.add_logs(entries)
+        finally:
+            self.invalidate("Log_Sistem")
+
+    def query_logs(self, aksi=None, pengguna=None, dari=None, sampai=None, halaman=0, per_halaman=50):
+        return self.inner.query_logs(aksi, pengguna, dari, sampai, halaman, per_halaman)
+
+    def opsi_log(self):
+        return self._baca("Log_Sistem", self.inner.opsi_log, kunci="Log_Sistem:opsi")
+
+    def get_users(self):
+        return self._baca("Users", self.inner.get_users).copy()
+
+    def get_pegawai(self):
+        return list(self._baca("Data_Pegawai", self.inner.get_pegawai))
+
+    def get_rekap(self):
+        return self._baca("Data_Utama", self.inner.get_rekap, kunci="Data_Utama:rekap").copy()
+
+    # Query ber-index yang hanya membaca irisan kecil; tidak di-cache
+    def query_attendance(self, start, end, names=None):
+        return self.inner.query_attendance(start, end, names)
+
+    def get_terbaru(self, n, names=None):
+        return self.inner.get_terbaru(n, names)
+
+    def file_dikenal(self, sha256):
+        return self.inner.file_dikenal(sha256)
+
+    def tap_baru(self, taps):
+        return self.inner.tap_baru(taps)
+
+    def ambil_tap(self, jendela):
+        return self.inner.ambil_tap(jendela)
+
+    def catat_ingest(self, taps, files):
+        self.inner.catat_ingest(taps, files)
+
+    def versi(self, nama):
+        return self.inner.versi(nama)
+
+    def sync(self):
+        try:
+            self.inner.sync()
+        finally:
+            self.invalidate()
+
+    def pull(self, penuh=False):
+        # Versi lokal naik bila master benar-benar ditarik, sehingga cache ikut kedaluwarsa
+        self.inner.pull(penuh)
+
+    def flush_logs(self):
+        self.inner.flush_logs()
+
+    def start_background(self):
+        self.inner.start_background()
+
+
+class Snapshot:
+    """Data baca bersama semua sesi: daftar pegawai sah, rekap bulanan mereka, dan baris terbaru.
+
+    Dibangun sekali per versi backend dan tidak pernah diubah sesudahnya; halaman hanya
+    memfilter/menurunkan frame baru darinya (jangan menulis ke frame ini di tempat).
+    """
+
+    def __init__(self, versi, pegawai, rekap, terbaru):
+        self.versi = versi
+        self.pegawai = pegawai      # tuple nama pegawai sah (kosong = tanpa filter)
+        self.rekap = rekap
+        self.terbaru = terbaru
+        self.nama_rekap = tuple(sorted(rekap['Nama'].unique().tolist()))
+
+    @classmethod
+    def kosong(cls):
+        return cls(None, (), pd.DataFrame(columns=KOLOM_REKAP), _data_kosong_tipe())
+
+
+class SnapshotStore:
+    """Satu Snapshot per proses, ditukar atomik (ganti referensi) saat versi Data_Utama/Data_Pegawai berubah.
+
+    Selama snapshot baru dibangun, sesi lain tetap memakai snapshot lama yang konsisten.
+    """
+
+    VERSI = ("Data_Utama", "Data_Pegawai")
+    JUMLAH_TERBARU = 10
+
+    def __init__(self, storage, master=None):
+        self.storage = storage
+        self.master = master or MasterPegawai(storage)
+        self.lock = threading.Lock()
+        self._snap = None
+
+    def _versi(self):
+        versi = tuple(self.storage.versi(nama) for nama in self.VERSI)
+        return None if None in versi else versi
+
+    def _bangun(self, versi):
+        with span("snapshot.bangun") as s:
+            daftar = self.master.get()
+            pegawai = daftar.nama
+            rekap = daftar.saring(self.storage.get_rekap()).reset_index(drop=True)
+            if daftar.kosong:
+                terbaru = self.storage.get_terbaru(self.JUMLAH_TERBARU)
+            elif rekap.empty:
+                terbaru = _data_kosong_tipe()
+            else:
+                # Ejaan nama seperti tersimpan (bisa berbeda spasi/kapital dari master)
+                terbaru = self.storage.get_terbaru(self.JUMLAH_TERBARU, rekap['Nama'].unique().tolist())
+            s['baris'] = len(rekap)
+        return Snapshot(versi, pegawai, rekap, terbaru)
+
+    def get(self):
+        versi = self._versi()
+        snap = self._snap
+        if snap is not None and versi is not None and snap.versi == versi:
+            return snap
+        if not self.lock.acquire(blocking=snap is None):
+            return snap  # sesi lain sedang membangun; pakai yang lama dulu
+        try:
+            if self._snap is not None and versi is not None and self._snap.versi == versi:
+                return self._snap
+            self._snap = self._bangun(versi)
+            return self._snap
+        finally:
+            self.lock.release()
+
+    def segarkan(self):
+        """Bangun snapshot versi terkini sekarang (mis. tepat setelah penulisan), bukan saat dibaca nanti."""
+        try:
+            self.get()
+        except Exception:
+            pass  # pembaca berikutnya akan mencoba lagi
+
+
+def buat_storage(mode, dir_lokal, conn=None):
+    """Bangun backend sesuai mode: "sqlite" (lokal saja) atau "sqlite+gsheets" (lokal + mirror)."""
+    lokal = SQLiteStorage(os.path.join(dir_lokal, "absensi.sqlite"))
+    if mode == "sqlite":
+        return CachedStorage(lokal)
+    if mode != "sqlite+gsheets":
+        raise ValueError(f"Mode storage tidak dikenal: {mode}")
+    remote = GSheetsStorage(conn, os.path.join(dir_lokal, "index_data_utama.sqlite"))
+    return CachedStorage(MirrorStorage(lokal, remote, os.path.join(dir_lokal, "spool_log.jsonl")))
+
+
+if __name__ == "__main__":
+    # Isi backend lokal dari CSV, mis. untuk mode "sqlite" tanpa Google Sheets:
+    #   python storage.py users users.csv
+    #   python storage.py pegawai pegawai.csv
+    #   python storage.py data data_utama.csv
+    if len(sys.argv) != 3 or sys.argv[1] not in ("users", "pegawai", "data"):
+        print("Pemakaian: python storage.py [users|pegawai|data] file.csv")
+        sys.exit(1)
+    target = SQLiteStorage(os.path.join(os.environ.get("ABSENSI_DIR_LOKAL", ".data_lokal"), "absensi.sqlite"))
+    df_csv = pd.read_csv(sys.argv[2])
+    if sys.argv[1] == "users":
+        target.set_users(df_csv)
+    elif sys.argv[1] == "pegawai":
+        target.set_pegawai(df_csv['Nama'].dropna().tolist())
+    else:
+        target.save_data(df_csv)
+    print(f"✅ {len(df_csv)} baris diimpor ke {sys.argv[1]}")
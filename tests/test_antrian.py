@@ -0,0 +1,49 @@
+"""Antrian tulis: file job hanya dihapus setelah job selesai."""
+import os
+
+import antrian
+from antrian import GAGAL, SELESAI, AntrianTulis
+from storage import SQLiteStorage
+from test_ingest import _export
+
+
+def _antrian(tmp_path):
+    return AntrianTulis(SQLiteStorage(str(tmp_path / "absensi.sqlite")), str(tmp_path / "antrian"))
+
+
+def test_batch_gagal_menyimpan_file_untuk_diulang(tmp_path, monkeypatch):
+    q = _antrian(tmp_path)
+    job_id = q.kirim([("a.txt", _export(["2025-01-01 07:30:00", "2025-01-01 17:00:00"]))], "admin")
+    asli = antrian.siapkan_ingest
+
+    def rusak(*args, **kwargs):
+        raise RuntimeError("process pool rusak")
+    monkeypatch.setattr(antrian, "siapkan_ingest", rusak)
+    try:
+        q.proses_menunggu()
+    except RuntimeError:
+        pass
+    assert q.status(job_id)['status'] == GAGAL
+    assert os.path.isdir(tmp_path / "antrian" / f"job_{job_id}")
+
+    monkeypatch.setattr(antrian, "siapkan_ingest", asli)
+    assert q.ulangi(job_id)
+    q.proses_menunggu()
+    assert q.status(job_id)['status'] == SELESAI and q.status(job_id)['hasil']['tap_baru'] == 2
+    assert not os.path.exists(tmp_path / "antrian" / f"job_{job_id}")
+
+
+def test_file_gagal_dibaca_menandai_job_gagal(tmp_path, monkeypatch):
+    q = _antrian(tmp_path)
+    job_id = q.kirim([("a.txt", _export(["2025-01-01 07:30:00"]))], "admin")
+    asli = antrian.siapkan_ingest
+
+    def sebagian(storage, sumber, **kwargs):
+        hasil = asli(storage, sumber, **kwargs)
+        hasil['per_file'] = [(path, RuntimeError("worker mati")) for path, _ in hasil['per_file']]
+        return hasil
+    monkeypatch.setattr(antrian, "siapkan_ingest", sebagian)
+    q.proses_menunggu()
+    job = q.status(job_id)
+    assert job['status'] == GAGAL and "a.txt" in job['galat']
+    assert os.path.isdir(tmp_path / "antrian" / f"job_{job_id}")
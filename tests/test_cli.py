@@ -0,0 +1,47 @@
+"""Kode keluar cli.py ingest."""
+import cli
+from storage import MirrorGagal, SQLiteStorage
+
+
+def _export(tmp_path, nama):
+    path = tmp_path / "mesin.txt"
+    path.write_text("".join(f"1\t2025-01-0{i + 1} 07:30:00\t1\t1\t{n}\t0\t0\t0\n" for i, n in enumerate(nama)))
+    return str(path)
+
+
+def _siapkan(tmp_path, monkeypatch, pegawai):
+    monkeypatch.setattr(cli, "MODE_STORAGE", "sqlite")
+    monkeypatch.setattr(cli, "DIR_LOKAL", str(tmp_path / "lokal"))
+    SQLiteStorage(str(tmp_path / "lokal" / "absensi.sqlite")).set_pegawai(pegawai)
+
+
+def test_ingest_tap_ditolak_kode_keluar_khusus(tmp_path, monkeypatch):
+    _siapkan(tmp_path, monkeypatch, ["Budi"])
+    assert cli.main(["ingest", _export(tmp_path, ["Budi", "Sari"])]) == cli.EXIT_TAP_DITOLAK
+
+
+def test_ingest_semua_dikenal_sukses(tmp_path, monkeypatch):
+    _siapkan(tmp_path, monkeypatch, ["Budi", "Sari"])
+    assert cli.main(["ingest", _export(tmp_path, ["Budi", "Sari"])]) == cli.EXIT_OK
+
+
+def test_ingest_galat_tak_terduga_kode_storage(tmp_path, monkeypatch):
+    _siapkan(tmp_path, monkeypatch, ["Budi"])
+
+    def rusak(*args, **kwargs):
+        raise RuntimeError("disk penuh")
+    monkeypatch.setattr(cli, "siapkan_ingest", rusak)
+    assert cli.main(["ingest", _export(tmp_path, ["Budi"])]) == cli.EXIT_STORAGE
+
+
+def test_ingest_mirror_gagal_tetap_mencatat_upload(tmp_path, monkeypatch):
+    _siapkan(tmp_path, monkeypatch, ["Budi"])
+    simpan_asli = cli.simpan_ingest
+
+    def mirror_gagal(storage, hasil, pdf_cache=None):
+        simpan_asli(storage, hasil, pdf_cache)
+        raise MirrorGagal("sheet tidak terjangkau")
+    monkeypatch.setattr(cli, "simpan_ingest", mirror_gagal)
+    assert cli.main(["ingest", _export(tmp_path, ["Budi"])]) == cli.EXIT_STORAGE
+    logs = SQLiteStorage(str(tmp_path / "lokal" / "absensi.sqlite")).get_logs()
+    assert logs['Aksi'].tolist() == ["UPLOAD"]
@@ -0,0 +1,99 @@
+"""Ingest idempoten (siapkan_ingest + simpan_ingest) sejalan dengan process_file."""
+import io
+import random
+import sqlite3
+
+import pandas as pd
+
+from core import iter_taps, process_file, siapkan_ingest, simpan_ingest
+from storage import SQLiteStorage, ke_teks
+from test_pairing import _normal, export_acak
+
+
+def _ingest(storage, *files):
+    hasil = siapkan_ingest(storage, [(f"f{i}.txt", isi) for i, isi in enumerate(files)])
+    simpan_ingest(storage, hasil)
+    return hasil
+
+
+def _export(baris):
+    return ("".join(f"1\t{b}\t1\t1\tBudi\t0\t0\t0\n" for b in baris)).encode()
+
+
+def test_tap_kembar_persis_sama_dengan_process_file(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "absensi.sqlite"))
+    data = _export(["2025-01-01 07:30:00", "2025-01-01 07:30:00"])
+    _ingest(storage, data)
+    hasil = storage.query_attendance('2025-01-01', '2025-01-01')
+    assert hasil['Status_Data'].tolist() == ["Lengkap (Normal)"]
+    assert process_file(io.BytesIO(data))['Status_Data'].tolist() == ["Lengkap (Normal)"]
+
+
+def test_file_bertumpuk_tidak_menggandakan_tap(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "absensi.sqlite"))
+    _ingest(storage, _export(["2025-01-01 07:30:00"]))
+    # Export berikutnya memuat ulang tap yang sama (sekali) ditambah tap baru
+    hasil = _ingest(storage, _export(["2025-01-01 07:30:00", "2025-01-02 08:00:00"]))
+    assert len(hasil['taps']) == 1
+    status = storage.query_attendance('2025-01-01', '2025-01-02')['Status_Data'].tolist()
+    assert status == ["Tidak Absen Pulang", "Tidak Absen Pulang"]
+
+
+def test_ingest_acak_sama_dengan_process_file(tmp_path):
+    for seed in range(10):
+        storage = SQLiteStorage(str(tmp_path / f"absensi{seed}.sqlite"))
+        data = export_acak(500 + seed)
+        _ingest(storage, data)
+        tersimpan = storage.get_data()
+        tersimpan['Tanggal'] = tersimpan['Tanggal'].dt.date
+        pd.testing.assert_frame_equal(_normal(ke_teks(tersimpan)), _normal(process_file(io.BytesIO(data))))
+
+
+def _sama_dengan_process_file(storage, data):
+    tersimpan = storage.get_data()
+    tersimpan['Tanggal'] = tersimpan['Tanggal'].dt.date
+    pd.testing.assert_frame_equal(_normal(ke_teks(tersimpan)), _normal(process_file(io.BytesIO(data))))
+
+
+def test_shift_malam_terpisah_dua_upload(tmp_path):
+    malam = _export(["2025-01-01 20:00:00"])
+    pagi = _export(["2025-01-02 06:00:00", "2025-01-02 21:00:00"])
+    for urutan, (pertama, kedua) in enumerate([(malam, pagi), (pagi, malam)]):
+        storage = SQLiteStorage(str(tmp_path / f"absensi{urutan}.sqlite"))
+        _ingest(storage, pertama)
+        _ingest(storage, kedua)
+        _sama_dengan_process_file(storage, malam + pagi)
+        assert storage.get_data().sort_values('Tanggal')['Status_Data'].tolist()[0] == "Lengkap (Malam)"
+
+
+def test_upload_terpisah_acak_urutan_sama_dengan_process_file(tmp_path):
+    # Export dipecah per hari lalu diupload satu per satu dalam urutan acak
+    for seed in range(10):
+        data = export_acak(700 + seed)
+        per_hari = {}
+        for baris in data.decode().splitlines(keepends=True):
+            per_hari.setdefault(baris.split('\t')[1][:10], []).append(baris)
+        bagian = ["".join(b).encode() for b in per_hari.values()]
+        random.Random(seed).shuffle(bagian)
+        storage = SQLiteStorage(str(tmp_path / f"absensi{seed}.sqlite"))
+        for isi in bagian:
+            _ingest(storage, isi)
+        _sama_dengan_process_file(storage, data)
+
+
+def test_migrasi_tap_mentah_lama(tmp_path):
+    path = str(tmp_path / "absensi.sqlite")
+    db = sqlite3.connect(path)
+    db.executescript("CREATE TABLE tap_mentah (id TEXT NOT NULL, waktu TEXT NOT NULL, mch TEXT NOT NULL, "
+                     "nama TEXT NOT NULL, PRIMARY KEY (id, waktu, mch));"
+                     "INSERT INTO tap_mentah VALUES ('1', '2025-01-01 07:30:00', '1', 'Budi');")
+    db.close()
+    storage = SQLiteStorage(path)
+    hasil = siapkan_ingest(storage, [("a.txt", _export(["2025-01-01 07:30:00", "2025-01-01 07:30:00"]))])
+    assert hasil['taps']['Ke'].tolist() == [1]  # kemunculan pertama sudah tersimpan
+
+
+def test_ke_berlanjut_antar_chunk():
+    data = _export(["2025-01-01 07:30:00", "2025-01-01 17:00:00", "2025-01-01 07:30:00", "2025-01-01 07:30:00"])
+    ke = pd.concat(iter_taps(data, chunksize=1), ignore_index=True)['Ke'].tolist()
+    assert ke == [0, 0, 1, 2]
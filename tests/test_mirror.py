@@ -0,0 +1,200 @@
+"""Deteksi perubahan spreadsheet remote oleh MirrorStorage.pull (tanpa Google Sheets sungguhan)."""
+import pandas as pd
+import pytest
+
+from kredensial import KredensialStore
+from storage import GSheetsStorage, MirrorGagal, MirrorStorage, SQLiteStorage
+
+
+class SpreadsheetPalsu:
+    def __init__(self, revisi):
+        self.revisi = list(revisi)
+        self.lastUpdateTime = self.revisi[0]  # seperti gspread: hanya diisi saat dibuka
+
+    def get_lastUpdateTime(self):
+        return self.revisi.pop(0) if len(self.revisi) > 1 else self.revisi[0]
+
+
+class WorksheetPalsu:
+    """Data_Utama di memori: hanya operasi gspread yang dipakai GSheetsStorage."""
+
+    id = 0
+
+    def __init__(self, nilai):
+        self.nilai = [list(r) for r in nilai]
+        self.spreadsheet = self
+
+    def get_all_values(self):
+        return [list(r) for r in self.nilai]
+
+    def append_rows(self, rows, value_input_option):
+        awal = len(self.nilai) + 1
+        self.nilai.extend(list(r) for r in rows)
+        return {'updates': {'updatedRange': f"Data_Utama!A{awal}:E{len(self.nilai)}"}}
+
+    def batch_update(self, permintaan, value_input_option=None):
+        if isinstance(permintaan, dict):  # spreadsheet.batch_update: deleteDimension
+            for p in permintaan['requests']:
+                del self.nilai[p['deleteDimension']['range']['startIndex']]
+            return
+        for p in permintaan:
+            self.nilai[int(p['range'].split(':')[0][1:]) - 1] = list(p['values'][0])
+
+
+class ClientPalsu:
+    def __init__(self, spreadsheet, worksheet=None):
+        self.spreadsheet = spreadsheet
+        self.ws = worksheet
+
+    def _open_spreadsheet(self):
+        return self.spreadsheet
+
+    def _select_worksheet(self, worksheet):
+        return self.ws
+
+
+class ConnPalsu:
+    def __init__(self, spreadsheet, worksheet=None):
+        self.client = ClientPalsu(spreadsheet, worksheet)
+
+
+class RemotePalsu(GSheetsStorage):
+    def __init__(self, conn, index_path):
+        super().__init__(conn, index_path)
+        self.pegawai = ['Budi']
+        self.users = []
+
+    def get_users(self):
+        return pd.DataFrame(self.users, columns=['Username', 'Password', 'Role', 'Nama_Lengkap'])
+
+    def get_pegawai(self):
+        return list(self.pegawai)
+
+    def get_data(self):
+        return pd.DataFrame(columns=['Nama', 'Tanggal', 'Jam_Masuk', 'Jam_Pulang', 'Status_Data'])
+
+    def get_logs(self):
+        return pd.DataFrame(columns=['Waktu', 'Aksi', 'Detail'])
+
+
+def test_revisi_diambil_ulang_tiap_cek(tmp_path):
+    remote = GSheetsStorage(ConnPalsu(SpreadsheetPalsu(["2026-01-01T00:00:00Z", "2026-01-02T00:00:00Z"])),
+                            str(tmp_path / "index.sqlite"))
+    assert remote.revisi() == "2026-01-01T00:00:00Z"
+    assert remote.revisi() == "2026-01-02T00:00:00Z"
+
+
+def test_pull_menarik_master_saat_revisi_berubah(tmp_path):
+    spreadsheet = SpreadsheetPalsu(["r1", "r1", "r2"])
+    remote = RemotePalsu(ConnPalsu(spreadsheet), str(tmp_path / "index.sqlite"))
+    lokal = SQLiteStorage(str(tmp_path / "absensi.sqlite"))
+    mirror = MirrorStorage(lokal, remote, str(tmp_path / "spool.jsonl"))  # lokal kosong: pull penuh (r1)
+    assert lokal.get_pegawai() == ['Budi']
+
+    remote.pegawai = ['Budi', 'Sari']
+    mirror.pull()  # revisi masih r1: dilewati
+    assert lokal.get_pegawai() == ['Budi']
+    mirror.pull()  # revisi r2: master ditarik ulang
+    assert lokal.get_pegawai() == ['Budi', 'Sari']
+
+
+class RemoteMemori(RemotePalsu):
+    """Remote Data_Utama di memori; hapus_data bisa dibuat gagal."""
+
+    def __init__(self, conn, index_path):
+        super().__init__(conn, index_path)
+        self.kunci = set()
+        self.gagal_hapus = False
+
+    def save_data(self, df):
+        self.kunci |= set(zip(df['Nama'].astype(str), pd.to_datetime(df['Tanggal']).dt.strftime('%Y-%m-%d')))
+        return df
+
+    def hapus_data(self, kunci):
+        if self.gagal_hapus:
+            raise ConnectionError("sheet tidak terjangkau")
+        self.kunci -= set(zip(kunci['Nama'].astype(str), pd.to_datetime(kunci['Tanggal']).dt.strftime('%Y-%m-%d')))
+        return len(kunci)
+
+
+def _baris(nama, tanggal):
+    return pd.DataFrame({'Nama': nama, 'Tanggal': tanggal, 'Jam_Masuk': '07:00:00', 'Jam_Pulang': '16:00:00',
+                         'Status_Data': 'Lengkap (Normal)'})
+
+
+def test_hapus_gagal_diulang_saat_sync(tmp_path):
+    remote = RemoteMemori(ConnPalsu(SpreadsheetPalsu(["r1"])), str(tmp_path / "index.sqlite"))
+    mirror = MirrorStorage(SQLiteStorage(str(tmp_path / "absensi.sqlite")), remote, str(tmp_path / "spool.jsonl"))
+    mirror.save_data(_baris(['Budi', 'Budi', 'Sari'], ['2025-01-01', '2025-01-02', '2025-01-01']))
+
+    remote.gagal_hapus = True
+    with pytest.raises(MirrorGagal):
+        mirror.hapus_data(_baris(['Budi', 'Sari'], ['2025-01-01', '2025-01-01']))
+    assert ('Budi', '2025-01-01') in remote.kunci and len(mirror.spool_hapus.pending()) == 2
+
+    # Sari 01-01 diisi lagi lokal sebelum hapus diulang: tidak boleh ikut terhapus di remote
+    mirror.save_data(_baris(['Sari'], ['2025-01-01']))
+    remote.gagal_hapus = False
+    mirror.sync()
+    assert remote.kunci == {('Budi', '2025-01-02'), ('Sari', '2025-01-01')}
+    assert mirror.spool_hapus.pending() == []
+
+
+def test_pull_diam_latar_menarik_perubahan_sheet(tmp_path):
+    spreadsheet = SpreadsheetPalsu(["r1", "r1", "r2"])
+    remote = RemotePalsu(ConnPalsu(spreadsheet), str(tmp_path / "index.sqlite"))
+    lokal = SQLiteStorage(str(tmp_path / "absensi.sqlite"))
+    mirror = MirrorStorage(lokal, remote, str(tmp_path / "spool.jsonl"))
+    versi = lokal.versi("Data_Pegawai")
+
+    remote.pegawai = ['Budi', 'Sari']
+    mirror.pull_diam()  # revisi tidak berubah: tidak ada unduhan, versi tetap
+    assert lokal.versi("Data_Pegawai") == versi
+    mirror.pull_diam()
+    assert lokal.get_pegawai() == ['Budi', 'Sari'] and lokal.versi("Data_Pegawai") > versi
+
+
+def test_refresh_kredensial_menarik_sheet_users(tmp_path):
+    spreadsheet = SpreadsheetPalsu(["r1", "r1", "r2"])
+    remote = RemotePalsu(ConnPalsu(spreadsheet), str(tmp_path / "index.sqlite"))
+    remote.users = [('admin', 'lama', 'admin', 'Admin')]
+    mirror = MirrorStorage(SQLiteStorage(str(tmp_path / "absensi.sqlite")), remote, str(tmp_path / "spool.jsonl"))
+    kredensial = KredensialStore(mirror)
+    assert kredensial.verifikasi('admin', 'lama') == ('admin', 'Admin')
+
+    remote.users = [('admin', 'baru', 'admin', 'Admin')]
+    kredensial.refresh()  # revisi r1: tidak ada yang ditarik
+    assert kredensial.verifikasi('admin', 'baru') is None
+    kredensial.refresh()  # revisi r2: sheet Users ditarik lewat mirror
+    assert kredensial.verifikasi('admin', 'baru') == ('admin', 'Admin')
+
+
+KEPALA = ['Nama', 'Tanggal', 'Jam_Masuk', 'Jam_Pulang', 'Status_Data']
+
+
+def test_index_memakai_posisi_baris_asli(tmp_path):
+    # Baris kosong di tengah dan kunci ganda tidak boleh menggeser nomor baris index
+    ws = WorksheetPalsu([KEPALA,
+                         ['Budi', '2026-01-05', '08:00:00', '17:00:00', 'Lengkap'],
+                         ['', '', '', '', ''],
+                         ['Budi', '2026-01-05', '08:00:00', '17:00:00', 'Lengkap'],
+                         ['Sari', '2026-01-05', '07:30:00', '16:00:00', 'Lengkap']])
+    remote = GSheetsStorage(ConnPalsu(SpreadsheetPalsu(["r1"]), ws), str(tmp_path / "index.sqlite"))
+    assert remote.hapus_data(pd.DataFrame({'Nama': ['Sari'], 'Tanggal': ['2026-01-05']})) == 1
+    assert [r[0] for r in ws.nilai] == ['Nama', 'Budi', '', 'Budi']
+
+
+def test_index_dibangun_ulang_setelah_sheet_diubah_pihak_lain(tmp_path):
+    spreadsheet = SpreadsheetPalsu(["r1"])
+    ws = WorksheetPalsu([KEPALA,
+                         ['Budi', '2026-01-05', '08:00:00', '17:00:00', 'Lengkap'],
+                         ['Sari', '2026-01-05', '07:30:00', '16:00:00', 'Lengkap']])
+    remote = GSheetsStorage(ConnPalsu(spreadsheet, ws), str(tmp_path / "index.sqlite"))
+    remote.hapus_data(pd.DataFrame({'Nama': ['Tidak_Ada'], 'Tanggal': ['2026-01-05']}))  # index dibangun (r1)
+
+    ws.nilai[1], ws.nilai[2] = ws.nilai[2], ws.nilai[1]  # sort manual di sheet
+    spreadsheet.revisi = ["r2"]
+    remote.save_data(pd.DataFrame({'Nama': ['Budi'], 'Tanggal': ['2026-01-05'], 'Jam_Masuk': ['09:00:00'],
+                                   'Jam_Pulang': ['17:00:00'], 'Status_Data': ['Lengkap']}))
+    assert ws.nilai[1] == ['Sari', '2026-01-05', '07:30:00', '16:00:00', 'Lengkap']
+    assert ws.nilai[2] == ['Budi', '2026-01-05', '09:00:00', '17:00:00', 'Lengkap']
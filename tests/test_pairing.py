@@ -0,0 +1,119 @@
+"""Paritas pairing vektor (core.pair_shifts / core.process_file) terhadap loop per pegawai lama."""
+import io
+import random
+from datetime import datetime, time, timedelta
+
+import pandas as pd
+import pytest
+
+from core import pair_shifts, process_file, read_taps
+from storage import KOLOM_DATA
+
+
+def pairing_lama(taps):
+    """Implementasi awal (loop per pegawai per tanggal), dipertahankan sebagai acuan."""
+    df = taps[['Nama', 'Timestamp']].copy()
+    df['Tanggal_Asli'] = df['Timestamp'].dt.date
+    df = df.sort_values(['Nama', 'Timestamp'])
+    final_data = []
+    for nama, group in df.groupby('Nama'):
+        dates = sorted(group['Tanggal_Asli'].unique())
+        used_timestamps = set()
+        for tgl in dates:
+            timestamps = sorted(group[group['Tanggal_Asli'] == tgl]['Timestamp'].tolist())
+            timestamps = [t for t in timestamps if t not in used_timestamps]
+            if not timestamps:
+                continue
+            log_pertama = timestamps[0]
+            log_terakhir = timestamps[-1] if len(timestamps) > 1 else None
+            jam_masuk_fix, jam_pulang_fix, status_data = "-", "-", "Tidak Absen Pulang"
+            if log_pertama.hour < 13:
+                jam_masuk_fix = log_pertama.strftime('%H:%M:%S')
+                if log_terakhir:
+                    jam_pulang_fix = log_terakhir.strftime('%H:%M:%S')
+                    status_data = "Lengkap (Normal)"
+                    used_timestamps.add(log_terakhir)
+            elif log_pertama.time() < time(17, 30):
+                if log_terakhir is None:
+                    jam_pulang_fix = log_pertama.strftime('%H:%M:%S')
+                    status_data = "Tidak Absen Pagi"
+                    used_timestamps.add(log_pertama)
+                else:
+                    jam_masuk_fix = log_pertama.strftime('%H:%M:%S')
+                    jam_pulang_fix = log_terakhir.strftime('%H:%M:%S')
+                    status_data = "Lengkap (Normal)"
+                    used_timestamps.add(log_terakhir)
+            else:
+                jam_masuk_fix = log_pertama.strftime('%H:%M:%S')
+                found_out = False
+                if log_terakhir and (log_terakhir - log_pertama).total_seconds() / 3600 > 3:
+                    jam_pulang_fix = log_terakhir.strftime('%H:%M:%S')
+                    status_data = "Lengkap (Normal)"
+                    used_timestamps.add(log_terakhir)
+                    found_out = True
+                if not found_out and tgl + timedelta(days=1) in dates:
+                    potential_out = sorted(group[group['Tanggal_Asli'] == tgl + timedelta(days=1)]['Timestamp'].tolist())[0]
+                    if potential_out.hour < 13:
+                        jam_pulang_fix = potential_out.strftime('%H:%M:%S')
+                        status_data = "Lengkap (Malam)"
+                        used_timestamps.add(potential_out)
+            final_data.append({'Nama': nama, 'Tanggal': tgl, 'Jam_Masuk': jam_masuk_fix,
+                               'Jam_Pulang': jam_pulang_fix, 'Status_Data': status_data})
+    return pd.DataFrame(final_data, columns=KOLOM_DATA)
+
+
+def export_acak(seed, n_pegawai=4, n_hari=8, acak_urutan=False):
+    """Export mesin tab-separated: jam acak sepanjang hari (termasuk rantai shift malam) dan tap kembar persis."""
+    r = random.Random(seed)
+    baris = []
+    for emp in range(n_pegawai):
+        for hari in range(n_hari):
+            tgl = datetime(2025, 1, 1) + timedelta(days=hari)
+            for _ in range(r.choice([0, 1, 1, 2, 2, 3, 4])):
+                if r.random() < 0.4:  # malam: masuk sore/malam, pulang pagi berikutnya
+                    jam = r.choice([r.randint(17, 23), r.randint(0, 8)])
+                else:
+                    jam = r.randint(0, 23)
+                t = tgl + timedelta(hours=jam, minutes=r.randint(0, 59), seconds=r.randint(0, 59))
+                for _ in range(2 if r.random() < 0.15 else 1):  # tap kembar (ID, waktu, mesin sama)
+                    baris.append((t, f"{emp}\t{t:%Y-%m-%d %H:%M:%S}\t1\t1\tPegawai {emp}\t0\t0\t0"))
+    baris.sort(key=lambda b: b[0])
+    if acak_urutan:
+        r.shuffle(baris)
+    return ("\n".join(b for _, b in baris) + "\n").encode()
+
+
+def _normal(df):
+    df = df.astype({'Nama': str, 'Jam_Masuk': str, 'Jam_Pulang': str, 'Status_Data': str})
+    df['Tanggal'] = pd.to_datetime(df['Tanggal'])
+    return df.sort_values(['Nama', 'Tanggal'], kind='mergesort').reset_index(drop=True)[KOLOM_DATA]
+
+
+def _taps(data):
+    return pd.concat(read_taps(io.BytesIO(data)), ignore_index=True)
+
+
+@pytest.mark.parametrize("seed", range(150))
+def test_pair_shifts_sama_dengan_loop_lama(seed):
+    taps = _taps(export_acak(seed, acak_urutan=seed % 3 == 0))
+    pd.testing.assert_frame_equal(_normal(pair_shifts(taps)), _normal(pairing_lama(taps)))
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("chunksize", [1, 3, 7, 100_000])
+def test_process_file_sama_dengan_loop_lama(seed, chunksize):
+    data = export_acak(1000 + seed, acak_urutan=seed % 4 == 0)
+    pd.testing.assert_frame_equal(_normal(process_file(io.BytesIO(data), chunksize=chunksize)),
+                                  _normal(pairing_lama(_taps(data))))
+
+
+def test_rantai_shift_malam_dan_tap_kembar():
+    data = export_acak(0, n_pegawai=0)  # kosong
+    assert process_file(io.BytesIO(data)).empty
+    baris = ["1\t2025-01-01 20:00:00", "1\t2025-01-02 06:00:00", "1\t2025-01-02 21:00:00",
+             "1\t2025-01-03 05:30:00", "1\t2025-01-03 07:30:00", "1\t2025-01-04 07:30:00", "1\t2025-01-04 07:30:00"]
+    data = ("\n".join(f"{b}\t1\t1\tBudi\t0\t0\t0" for b in reversed(baris)) + "\n").encode()
+    hasil = _normal(process_file(io.BytesIO(data), chunksize=2))
+    pd.testing.assert_frame_equal(hasil, _normal(pairing_lama(_taps(data))))
+    assert hasil['Status_Data'].tolist() == ["Lengkap (Malam)", "Lengkap (Malam)", "Tidak Absen Pulang",
+                                             "Lengkap (Normal)"]
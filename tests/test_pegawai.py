@@ -0,0 +1,36 @@
+"""Master pegawai: pencocokan nama ter-normalisasi untuk ingest dan laporan."""
+import pandas as pd
+
+from pegawai import DaftarPegawai
+from storage import SQLiteStorage, SnapshotStore
+
+
+def _data(nama):
+    return pd.DataFrame({'Nama': nama, 'Tanggal': ['2025-01-02'] * len(nama), 'Jam_Masuk': '07:30:00',
+                         'Jam_Pulang': '16:00:00', 'Status_Data': 'Lengkap (Normal)'})
+
+
+def test_kanonik_dan_tolak():
+    daftar = DaftarPegawai(1, ['Budi  Santoso', 'Sari'])
+    hasil = daftar.kanonik(pd.Series(['BUDI santoso ', 'sari', 'Anton']))
+    assert hasil.tolist()[:2] == ['Budi Santoso', 'Sari'] and pd.isna(hasil[2])
+
+
+def test_histori_dengan_ejaan_lama_tetap_tampil(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "absensi.sqlite"))
+    # Histori tersimpan dengan ejaan mentah master (spasi ganda), seperti sebelum ada normalisasi
+    storage.save_data(_data(['Budi  Santoso', 'Anton']))
+    storage.set_pegawai(['Budi  Santoso'])
+
+    snap = SnapshotStore(storage).get()
+    assert snap.rekap['Nama'].tolist() == ['Budi  Santoso']
+    assert snap.terbaru['Nama'].astype(str).tolist() == ['Budi  Santoso']
+
+    daftar = DaftarPegawai(1, storage.get_pegawai())
+    irisan = daftar.saring(storage.query_attendance('2025-01-01', '2025-01-31'))
+    assert irisan['Nama'].astype(str).tolist() == ['Budi  Santoso']
+
+
+def test_master_kosong_tanpa_filter():
+    df = _data(['A', 'B'])
+    assert DaftarPegawai(1, []).saring(df) is df